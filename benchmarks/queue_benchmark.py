@@ -0,0 +1,76 @@
+"""Enqueue throughput of QueueManager: one call per task against enqueue_many.
+
+Run from the repository root against a scratch Redis database, which the
+benchmark empties (FLUSHDB) before each measurement:
+
+    python -m benchmarks.queue_benchmark --redis-url redis://localhost:6379/15
+
+For each batch size it reports jobs per second for enqueue_task in a loop,
+enqueue_many with independent tasks, and enqueue_many with the tasks linked
+in Architecture -> Code -> Testing -> Deployment chains of four. Small
+batches are repeated until at least --min-jobs jobs have been enqueued.
+
+--fake runs against an in-process fakeredis server instead (pip install
+fakeredis). It has no network round trips, so it only shows client-side cost.
+"""
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from utils.queue_manager import QueueManager
+
+BATCH_SIZES = [1, 100, 10000]
+CHAIN = ["architect", "developer", "tester", "deployer"]
+
+def make_tasks(size: int, chained: bool) -> List[Dict]:
+    tasks = []
+    for index in range(size):
+        task = {"type": "agent_task", "payload": {"role": CHAIN[index % len(CHAIN)], "index": index}}
+        if chained and index % len(CHAIN):
+            task["depends_on"] = [index - 1]
+        tasks.append(task)
+    return tasks
+
+def measure(manager: QueueManager, size: int, min_jobs: int,
+            enqueue: Callable[[QueueManager, List[Dict]], None], chained: bool = False) -> float:
+    """Jobs per second for batches of `size`"""
+    manager.redis.flushdb()
+    repeats = max(1, min_jobs // size)
+    batches = [make_tasks(size, chained) for _ in range(repeats)]
+    started = time.perf_counter()
+    for tasks in batches:
+        enqueue(manager, tasks)
+    return size * repeats / (time.perf_counter() - started)
+
+def one_by_one(manager: QueueManager, tasks: List[Dict]):
+    for task in tasks:
+        manager.enqueue_task(task["type"], task["payload"])
+
+def bulk(manager: QueueManager, tasks: List[Dict]):
+    manager.enqueue_many(tasks)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--min-jobs", type=int, default=2000)
+    parser.add_argument("--fake", action="store_true", help="Use an in-process fakeredis server")
+    args = parser.parse_args()
+
+    if args.fake:
+        import fakeredis
+        manager = QueueManager(redis=fakeredis.FakeRedis())
+    else:
+        manager = QueueManager(args.redis_url)
+
+    print(f"{'batch':>8}{'enqueue_task':>16}{'enqueue_many':>16}{'chained':>16}   (jobs/sec)")
+    for size in BATCH_SIZES:
+        rates = [
+            measure(manager, size, args.min_jobs, one_by_one),
+            measure(manager, size, args.min_jobs, bulk),
+            measure(manager, size, args.min_jobs, bulk, chained=True),
+        ]
+        print(f"{size:>8}" + "".join(f"{rate:>16.0f}" for rate in rates))
+    manager.redis.flushdb()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Simulated comparison of routing strategies against fake LMStudio backends.
+
+Run from the repository root:
+
+    python -m benchmarks.routing_benchmark --requests 20000 --rate 12
+
+Each backend has a base service time and slows down linearly with the number
+of requests it is already serving, which is roughly how a single GPU behaves
+under concurrent generations. One backend is deliberately slow and another
+suffers occasional latency spikes, so strategies that ignore latency show it in
+their tail.
+
+With --mixed, requests vary in size the way pipeline traffic does (mostly short
+prompts with a minority of very long ones), service time scales with the
+request's tokens, and strategies are told each request's predicted tokens.
+Long requests make the cluster saturate sooner, so use a lower rate:
+
+    python -m benchmarks.routing_benchmark --mixed --rate 0.8
+"""
+import argparse
+import heapq
+import random
+from datetime import datetime
+from typing import Dict, List
+
+from utils.llm_cluster import ROUTING_STRATEGIES, LMStudioInstance, RoutingStrategy
+
+# (base service time in seconds, slowdown per concurrent request, spike probability)
+BACKENDS = [
+    (0.8, 0.35, 0.0),
+    (0.8, 0.35, 0.0),
+    (1.0, 0.35, 0.05),
+    (2.5, 0.35, 0.0),
+]
+
+# Tokens in a request that takes a backend's base service time
+REFERENCE_TOKENS = 1000
+
+# (probability, tokens) for --mixed traffic
+REQUEST_SIZES = [
+    (0.85, 300),
+    (0.15, 8000),
+]
+
+def request_tokens(rng: random.Random) -> int:
+    draw = rng.random()
+    for probability, tokens in REQUEST_SIZES:
+        if draw < probability:
+            return tokens
+        draw -= probability
+    return REQUEST_SIZES[-1][1]
+
+class LegacyStrategy(RoutingStrategy):
+    """The pre-engine behaviour: a fixed score that only changes on health checks"""
+    name = "legacy"
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        return min(candidates, key=lambda x: x.current_load * 0.7 + (x.queue_length / 10) * 0.3)
+
+def make_instances() -> List[LMStudioInstance]:
+    return [
+        LMStudioInstance(
+            host=f"10.0.0.{i + 1}", port=1234, last_health_check=datetime.now(),
+            is_healthy=True, current_load=0.0, queue_length=0, total_requests=0,
+            failed_requests=0, avg_response_time=0.0
+        )
+        for i in range(len(BACKENDS))
+    ]
+
+def percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def simulate(strategy: RoutingStrategy, requests: int, rate: float, seed: int,
+             mixed: bool = False) -> Dict[str, float]:
+    rng = random.Random(seed)
+    random.seed(seed)  # Strategies draw from the module-level generator
+    instances = make_instances()
+    events = []  # (time, sequence, kind, instance index, start time, tokens)
+    now = 0.0
+    for n in range(requests):
+        now += rng.expovariate(rate)
+        tokens = request_tokens(rng) if mixed else 0
+        heapq.heappush(events, (now, n, "arrival", -1, now, tokens))
+
+    latencies = []
+    sequence = requests
+    while events:
+        now, _, kind, index, start, tokens = heapq.heappop(events)
+        if kind == "arrival":
+            instance = strategy.select(instances, tokens)
+            index = instances.index(instance)
+            base, slowdown, spike = BACKENDS[index]
+            if mixed:
+                # A long generation slows the node more than a short one
+                contention = instance.outstanding_tokens / REFERENCE_TOKENS
+                service = base * tokens / REFERENCE_TOKENS * (1 + slowdown * contention)
+            else:
+                service = base * (1 + slowdown * instance.in_flight)
+            service *= rng.uniform(0.8, 1.2)
+            if rng.random() < spike:
+                service *= 8
+            instance.in_flight += 1
+            if tokens:
+                # As LLMClusterManager._select_instance does
+                instance.outstanding_tokens += tokens
+                instance.avg_request_tokens = (
+                    0.9 * instance.avg_request_tokens + 0.1 * tokens
+                    if instance.avg_request_tokens else float(tokens)
+                )
+            sequence += 1
+            heapq.heappush(events, (now + service, sequence, "done", index, now, tokens))
+        else:
+            instance = instances[index]
+            instance.in_flight -= 1
+            instance.outstanding_tokens -= tokens
+            latency = now - start
+            instance.total_requests += 1
+            if tokens:
+                # As LLMClusterManager._release_instance does: latency scaled to a typical request
+                instance.observe_latency(latency * instance.avg_request_tokens / tokens, now=now)
+            else:
+                instance.observe_latency(latency, now=now)
+            latencies.append(latency)
+
+    latencies.sort()
+    return {
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=3.0, help="Arrivals per second")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mixed", action="store_true", help="Mix short and long requests")
+    args = parser.parse_args()
+
+    strategies = {"legacy": LegacyStrategy, **ROUTING_STRATEGIES}
+    print(f"{'strategy':<22}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, strategy in strategies.items():
+        stats = simulate(strategy(), args.requests, args.rate, args.seed, args.mixed)
+        print(f"{name:<22}" + "".join(f"{stats[k]:>10.2f}" for k in ("mean", "p50", "p95", "p99", "max")))
+
+if __name__ == "__main__":
+    main()
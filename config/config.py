@@ -7,11 +7,44 @@ load_dotenv()
 # LM Studio Configuration
 config_list = [{
     "model": "qwen2.5-coder-3b-instruct",
-    "api_base": "http://192.168.7.155:1234/v1",
+    "api_base": os.getenv("LMSTUDIO_BASE_URL", "http://192.168.7.155:1234/v1"),
     "api_key": "sk-xxx",
     "api_type": "open_ai"
 }]
 
+# Direct LMStudio access for scripts and task workers
+LMSTUDIO_CONFIG = {
+    "base_url": config_list[0]["api_base"],
+    "api_key": config_list[0]["api_key"],
+    # Workers take backend health from the gateway (its Redis table when
+    # LLM_CLUSTER_REDIS_URL is set, else this URL) instead of probing per task
+    "gateway_url": os.getenv("LLM_CLUSTER_GATEWAY_URL"),
+    "health_ttl": float(os.getenv("LMSTUDIO_HEALTH_TTL", "5"))
+}
+
+# LLM Cluster Configuration
+CLUSTER_CONFIG = {
+    # JSON or YAML list of instances (see instances.example.yaml), reloaded on change.
+    # LLM_CLUSTER_INSTANCES="host:port,host:port" declares instances inline instead.
+    "registry_path": os.getenv("LLM_CLUSTER_REGISTRY"),
+    "network_range": os.getenv("LLM_CLUSTER_NETWORK", "192.168.1.0/24"),
+    # Subnet scanning defaults to on only when no instances are declared
+    "network_discovery": (
+        os.getenv("LLM_CLUSTER_SCAN").lower() in ("1", "true", "yes")
+        if os.getenv("LLM_CLUSTER_SCAN") else None
+    ),
+    # Redis URL shared by every gateway worker; only one of them probes and scans
+    "shared_state": os.getenv("LLM_CLUSTER_REDIS_URL"),
+    # least_work, p2c, peak_ewma, least_outstanding or weighted_round_robin
+    "routing_strategy": os.getenv("LLM_CLUSTER_ROUTING", "least_work"),
+    # In-flight requests per node, unless the registry sets a node's own limit
+    "max_concurrency_per_instance": int(os.getenv("LLM_CLUSTER_MAX_CONCURRENCY", "4")),
+    # Attempts per request on different nodes after connection errors or 5xx
+    "max_attempts": int(os.getenv("LLM_CLUSTER_MAX_ATTEMPTS", "3")),
+    # Send a duplicate of a slow request to a second node, within the retry budget
+    "hedge_requests": os.getenv("LLM_CLUSTER_HEDGE", "").lower() in ("1", "true", "yes")
+}
+
 # LLM Configuration for AutoGen
 LLM_CONFIG = {
     "config_list": config_list,
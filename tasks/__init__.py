@@ -1,26 +1,19 @@
 from typing import Dict, Any
 import logging
-from ..utils.lmstudio_monitor import LMStudioMonitor
-from config.config import LMSTUDIO_CONFIG
+from utils.health_view import shared_health_view
 
 def agent_task(task_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Execute an agent task through LMStudio
     """
-    # Initialize monitor
-    monitor = LMStudioMonitor(LMSTUDIO_CONFIG['base_url'])
-    
-    # Check LMStudio status
-    if not monitor.is_running():
-        return {
-            "status": "error",
-            "error": "LMStudio is not running"
-        }
-    
-    if not monitor.check_api_health():
+    # Check LMStudio status against the process-wide cached snapshot
+    health = shared_health_view()
+    model = task_data["payload"].get("model")
+    if not health.is_healthy(model):
+        reason = health.snapshot()["error"] or (f"none serves {model}" if model else "all instances are down")
         return {
             "status": "error",
-            "error": "LMStudio API is not responding"
+            "error": f"No healthy LMStudio instance available: {reason}"
         }
     
     try:
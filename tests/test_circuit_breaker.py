@@ -0,0 +1,74 @@
+from utils.circuit_breaker import CircuitBreaker
+
+def breaker(**settings):
+    transitions = []
+    settings.setdefault("min_requests", 4)
+    cb = CircuitBreaker(on_transition=lambda previous, state, reason: transitions.append(state), **settings)
+    return cb, transitions
+
+def test_opens_on_error_rate_once_enough_requests_completed():
+    cb, transitions = breaker()
+    for _ in range(3):
+        cb.record(False, now=1.0)
+    assert cb.state == CircuitBreaker.CLOSED  # Below min_requests
+    cb.record(False, now=1.0)
+    assert cb.state == CircuitBreaker.OPEN
+    assert transitions == [CircuitBreaker.OPEN]
+    assert not cb.is_available(now=2.0)
+
+def test_long_generation_is_not_slow():
+    cb, _ = breaker()
+    for _ in range(10):
+        # 30k tokens over ten minutes, first token after a second
+        cb.record(True, ttft=1.0, seconds_per_token=600 / 30000, now=1.0)
+    assert cb.state == CircuitBreaker.CLOSED
+
+def test_opens_on_slow_first_token_or_slow_tokens():
+    cb, _ = breaker(slow_call_threshold=10.0)
+    for _ in range(4):
+        cb.record(True, ttft=30.0, now=1.0)
+    assert cb.state == CircuitBreaker.OPEN
+
+    cb, _ = breaker(slow_token_threshold=0.5)
+    for _ in range(4):
+        cb.record(True, seconds_per_token=2.0, now=1.0)
+    assert cb.state == CircuitBreaker.OPEN
+
+def test_half_open_probe_closes_or_reopens_with_backoff():
+    cb, transitions = breaker(open_duration=10.0)
+    for _ in range(4):
+        cb.record(False, now=0.0)
+    assert cb.is_available(now=10.0)
+
+    cb.on_dispatch(now=10.0)
+    assert cb.state == CircuitBreaker.HALF_OPEN
+    assert not cb.is_available(now=10.0)  # One probe at a time
+    cb.record(False, now=11.0)
+    assert cb.state == CircuitBreaker.OPEN
+    assert not cb.is_available(now=30.0)  # Second trip waits twice as long
+    assert cb.is_available(now=31.0)
+
+    cb.on_dispatch(now=31.0)
+    cb.record(True, ttft=0.5, now=32.0)
+    assert cb.state == CircuitBreaker.CLOSED
+    assert transitions == [
+        CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN,
+        CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED
+    ]
+
+def test_abandoned_probe_frees_the_half_open_slot():
+    cb, _ = breaker(open_duration=1.0)
+    for _ in range(4):
+        cb.record(False, now=0.0)
+    cb.on_dispatch(now=1.0)
+    assert not cb.is_available(now=1.0)
+    cb.on_abandoned()
+    assert cb.is_available(now=1.0)
+    assert cb.state == CircuitBreaker.HALF_OPEN
+
+def test_outcomes_age_out_of_the_window():
+    cb, _ = breaker(window=60.0)
+    for _ in range(3):
+        cb.record(False, now=0.0)
+    cb.record(False, now=100.0)
+    assert cb.state == CircuitBreaker.CLOSED
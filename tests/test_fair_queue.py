@@ -0,0 +1,106 @@
+import pytest
+
+from utils.fair_queue import FairQueue, priority_class
+
+def fill(queue, caller, count, name="normal", cost=10):
+    for n in range(count):
+        queue.push([caller, n], name, caller, cost, order_key=n)
+
+def run_pass(queue, slots, blocked=()):
+    """One scheduling pass with `slots` free slots; returns the callers served in order"""
+    served = []
+
+    def offer(item):
+        if item[0] in blocked:
+            return False
+        if len(served) == slots:
+            return None
+        served.append(item[0])
+        return True
+
+    queue.schedule(offer)
+    return served
+
+def test_priority_class_names_and_numbers():
+    assert priority_class(None) == "normal"
+    assert priority_class(" Interactive ") == "interactive"
+    assert priority_class("-1") == "batch"
+    assert priority_class(3) == "interactive"
+    with pytest.raises(ValueError):
+        priority_class("urgent")
+
+def test_trickle_caller_is_not_starved_by_a_flood():
+    queue = FairQueue(quantum=10)
+    fill(queue, "flood", 100)
+    fill(queue, "trickle", 3)
+    served = [caller for _ in range(6) for caller in run_pass(queue, 1)]
+    assert served == ["flood", "trickle"] * 3
+
+def test_callers_share_tokens_not_requests():
+    queue = FairQueue(quantum=100)
+    fill(queue, "small", 20, cost=10)
+    fill(queue, "large", 20, cost=100)
+    served = run_pass(queue, 11)
+    assert served.count("small") == 10
+    assert served.count("large") == 1
+
+def test_interrupted_turn_resumes_without_fresh_credit():
+    queue = FairQueue(quantum=30)
+    fill(queue, "a", 6)
+    fill(queue, "b", 6)
+    served = [caller for _ in range(12) for caller in run_pass(queue, 1)]
+    assert served == ["a"] * 3 + ["b"] * 3 + ["a"] * 3 + ["b"] * 3
+
+def test_classes_are_served_in_strict_order():
+    queue = FairQueue()
+    fill(queue, "batch-caller", 2, name="batch")
+    fill(queue, "normal-caller", 2, name="normal")
+    fill(queue, "interactive-caller", 2, name="interactive")
+    assert run_pass(queue, 100) == (
+        ["interactive-caller"] * 2 + ["normal-caller"] * 2 + ["batch-caller"] * 2
+    )
+
+def test_lower_class_waits_while_a_higher_one_has_work():
+    queue = FairQueue()
+    fill(queue, "batch-caller", 5, name="batch")
+    fill(queue, "interactive-caller", 5, name="interactive")
+    served = [caller for _ in range(5) for caller in run_pass(queue, 1)]
+    assert served == ["interactive-caller"] * 5
+    assert run_pass(queue, 1) == ["batch-caller"]
+
+def test_blocked_higher_class_lets_lower_class_through():
+    queue = FairQueue()
+    fill(queue, "interactive-caller", 1, name="interactive")
+    fill(queue, "batch-caller", 1, name="batch")
+    assert run_pass(queue, 1, blocked={"interactive-caller"}) == ["batch-caller"]
+    assert queue.depth("interactive") == 1
+
+@pytest.mark.parametrize("outcome", ["no capacity", "blocked"])
+def test_credit_is_not_banked_while_a_caller_cannot_be_served(outcome):
+    queue = FairQueue(quantum=10)
+    fill(queue, "a", 10)
+    fill(queue, "b", 10)
+    for _ in range(5):
+        if outcome == "no capacity":
+            assert run_pass(queue, 0) == []  # Offer returns None
+        else:
+            assert run_pass(queue, 0, blocked={"a", "b"}) == []  # Offer returns False
+    # Five skipped visits must not turn into a burst of five once there is room
+    assert run_pass(queue, 4) == ["a", "b", "a", "b"]
+
+def test_blocked_caller_does_not_bank_credit_while_others_are_served():
+    queue = FairQueue(quantum=10)
+    fill(queue, "a", 10)
+    fill(queue, "b", 10)
+    for _ in range(5):
+        assert run_pass(queue, 1, blocked={"a"}) == ["b"]
+    assert run_pass(queue, 4) == ["a", "b", "a", "b"]
+
+def test_remove_drops_item_and_empty_caller():
+    queue = FairQueue()
+    item = ["a", 0]
+    queue.push(item, "normal", "a", 10, order_key=0)
+    assert queue.remove(item)
+    assert not queue.remove(item)
+    assert len(queue) == 0
+    assert queue.callers("normal") == 0
@@ -0,0 +1,42 @@
+import json
+import os
+
+import pytest
+
+from utils.instance_registry import InstanceRegistry, load_registry_env
+
+def write(path, entries):
+    path.write_text(json.dumps(entries))
+    # Make the change visible even within the filesystem's timestamp resolution
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_env_entries_and_default_port():
+    specs = load_registry_env("10.0.0.1, 10.0.0.2:5678", default_port=1234)
+    assert [spec.key for spec in specs] == ["10.0.0.1:1234", "10.0.0.2:5678"]
+
+def test_missing_file_on_first_load_raises(tmp_path):
+    with pytest.raises(ValueError):
+        InstanceRegistry(tmp_path / "instances.json").poll()
+
+def test_unparsable_file_on_first_load_raises(tmp_path):
+    path = tmp_path / "instances.json"
+    path.write_text("[")
+    with pytest.raises(ValueError):
+        InstanceRegistry(path).poll()
+
+def test_last_good_registry_survives_deletion_and_bad_edits(tmp_path):
+    path = tmp_path / "instances.json"
+    write(path, [{"host": "a", "port": 1, "weight": 2}, "b:1"])
+    registry = InstanceRegistry(path)
+    specs = registry.poll()
+    assert [(spec.key, spec.weight) for spec in specs] == [("a:1", 2.0), ("b:1", 1.0)]
+    assert registry.poll() is None  # Unchanged
+
+    path.unlink()
+    assert registry.poll() is None
+    path.write_text("[")
+    assert registry.poll() is None
+
+    write(path, ["a:1"])
+    assert [spec.key for spec in registry.poll()] == ["a:1"]
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from utils.latency_histogram import LogHistogram, RollingHistogram
+
+def exact_quantile(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.99])
+def test_quantiles_are_within_relative_accuracy(q):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0, 2) for _ in range(5000)]
+    histogram = LogHistogram(relative_accuracy=0.02)
+    for value in values:
+        histogram.add(value)
+    expected = exact_quantile(values, q)
+    assert abs(histogram.quantile(q) - expected) <= 0.02 * expected
+
+def test_empty_and_tiny_values():
+    histogram = LogHistogram(min_value=1e-3)
+    assert histogram.quantile(0.5) is None
+    histogram.add(0.0)
+    histogram.add(1e-6)
+    histogram.add(5.0)
+    assert histogram.quantile(0.0) == 0.0
+    assert histogram.quantile(1.0) == pytest.approx(5.0, rel=0.02)
+    assert histogram.count == 3
+
+def test_large_values_are_clamped_to_the_top_bucket():
+    histogram = LogHistogram(max_value=100.0)
+    histogram.add(1e9)
+    assert histogram.quantile(0.5) == pytest.approx(100.0, rel=0.05)
+    assert len(histogram.buckets) == 1
+
+def test_merge_matches_a_single_histogram():
+    values = [0.1 * n for n in range(1, 200)]
+    merged, single = LogHistogram(), LogHistogram()
+    halves = LogHistogram(), LogHistogram()
+    for n, value in enumerate(values):
+        halves[n % 2].add(value)
+        single.add(value)
+    merged.merge(halves[0])
+    merged.merge(halves[1])
+    assert merged.count == single.count
+    assert merged.buckets == single.buckets
+    assert merged.quantile(0.95) == single.quantile(0.95)
+
+def test_rolling_histogram_ages_samples_out():
+    rolling = RollingHistogram(window=60.0, slots=6)
+    rolling.add(1.0, now=0.0)
+    rolling.add(2.0, now=35.0)
+    assert rolling.snapshot(now=55.0).count == 2
+    assert rolling.snapshot(now=65.0).count == 1  # The first slot left the window
+    summary = rolling.summary(now=65.0)
+    assert summary["count"] == 1
+    assert summary["p50"] == pytest.approx(2.0, rel=0.02)
+    assert rolling.snapshot(now=200.0).count == 0
+
+def test_rolling_histogram_recycles_slots():
+    rolling = RollingHistogram(window=60.0, slots=6)
+    rolling.add(1.0, now=0.0)
+    rolling.add(3.0, now=60.0)  # Same slot one window later
+    snapshot = rolling.snapshot(now=60.0)
+    assert snapshot.count == 1
+    assert snapshot.quantile(0.5) == pytest.approx(3.0, rel=0.02)
@@ -0,0 +1,243 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+
+from utils import cluster_api
+from utils.llm_cluster import (
+    ClusterSaturatedError, InstanceError, LLMClusterManager, LMStudioInstance, RetryBudget,
+    RoutingStrategy, UpstreamRequestError
+)
+
+REQUEST = {"model": "m", "messages": [{"role": "user", "content": "hello"}]}
+
+def completion(content="ok"):
+    return httpx.Response(200, json={
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 1}
+    })
+
+def make_cluster(handlers, **settings):
+    """A manager over fake backends: one instance per handler, each behind an httpx.MockTransport"""
+    settings.setdefault("max_concurrency_per_instance", 1)
+    manager = LLMClusterManager(
+        network_discovery=False, prefix_affinity=False, cache_size=0, coalesce_requests=False,
+        **settings
+    )
+    for n, handler in enumerate(handlers):
+        instance = LMStudioInstance(f"10.0.0.{n + 1}", 1234, datetime.now(), True, 0, 0, 0, 0, 0)
+        instance.models = ["m"]
+        manager.instances[instance.key] = instance
+        manager._async_clients[instance.key] = httpx.AsyncClient(
+            base_url=f"http://{instance.key}", transport=httpx.MockTransport(handler)
+        )
+    with manager.lock:
+        manager._rebuild_indexes()
+    return manager
+
+def assert_idle(manager):
+    """Every slot and predicted token has been handed back"""
+    assert not manager._waiters
+    for instance in manager.instances.values():
+        assert (instance.in_flight, instance.outstanding_tokens) == (0, 0)
+
+class Gate:
+    """Backend handler that holds requests until opened"""
+
+    def __init__(self):
+        self.opened = asyncio.Event()
+        self.requests = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        await self.opened.wait()
+        return completion()
+
+async def queued(manager, count):
+    while len(manager._waiters) < count:
+        await asyncio.sleep(0)
+
+def test_full_queue_rejects_and_drains():
+    async def main():
+        gate = Gate()
+        manager = make_cluster([gate], max_queue_size=1)
+        running = asyncio.ensure_future(manager.aexecute_request(REQUEST))
+        waiting = asyncio.ensure_future(manager.aexecute_request(REQUEST))
+        await queued(manager, 1)
+
+        with pytest.raises(ClusterSaturatedError) as rejected:
+            await manager.aexecute_request(REQUEST)
+        assert rejected.value.retry_after > 0
+        assert manager.admission_stats["rejected_queue_full"] == 1
+
+        gate.opened.set()
+        await asyncio.gather(running, waiting)
+        assert gate.requests == 2
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
+
+def test_full_queue_is_a_429_with_retry_after(monkeypatch):
+    testclient = pytest.importorskip("fastapi.testclient")
+    manager = make_cluster([lambda request: completion()], max_queue_size=0)
+    next(iter(manager.instances.values())).in_flight = 1  # Its only slot is taken
+    monkeypatch.setattr(cluster_api, "cluster", manager)
+
+    response = testclient.TestClient(cluster_api.app).post("/v1/chat/completions", json=REQUEST)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 0
+
+def test_queue_timeout_rejects_and_leaves_no_waiter():
+    async def main():
+        gate = Gate()
+        manager = make_cluster([gate], queue_timeout=0.05)
+        running = asyncio.ensure_future(manager.aexecute_request(REQUEST))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(ClusterSaturatedError):
+            await manager.aexecute_request(REQUEST)
+        assert manager.admission_stats["rejected_timeout"] == 1
+        assert not manager._waiters
+
+        gate.opened.set()
+        await running
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
+
+@pytest.mark.parametrize("granted", [True, False])
+def test_slot_granted_to_a_leaving_waiter_is_handed_back(granted):
+    async def main():
+        manager = make_cluster([lambda request: completion()])
+        holder = await manager._aacquire_instance(REQUEST)
+        waiter = asyncio.ensure_future(manager._aacquire_instance(REQUEST))
+        await queued(manager, 1)
+        [entry] = manager._waiters.items()
+
+        # The slot is offered to the waiter; the grant is delivered on the next loop turn
+        manager._release_instance(holder, True)
+        if granted:
+            waiter.cancel()  # Leaves once the grant has landed
+        else:
+            entry.future.cancel()  # Gave up before the grant landed, as on a queue timeout
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        assert_idle(manager)
+
+        # The slot is free for the next request straight away
+        assert (await manager.aexecute_request(REQUEST))["choices"]
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
+
+class InOrder(RoutingStrategy):
+    """Route to the first candidate by key, so tests know which node is tried first"""
+
+    def select(self, candidates, tokens=0):
+        return min(candidates, key=lambda x: x.key)
+
+def ordered_cluster(handlers, **settings):
+    manager = make_cluster(handlers, **settings)
+    manager.router = InOrder()
+    return manager
+
+def failing(status):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if isinstance(status, Exception):
+            raise status
+        return httpx.Response(status, json={"error": "nope"})
+
+    handler.calls = calls
+    return handler
+
+@pytest.mark.parametrize("failure", [500, httpx.ConnectError("refused")])
+def test_fails_over_to_another_instance(failure):
+    async def main():
+        broken = failing(failure)
+        manager = ordered_cluster([broken, lambda request: completion("second")])
+        result = await manager.aexecute_request(REQUEST)
+        assert result["choices"][0]["message"]["content"] == "second"
+        assert len(broken.calls) == 1
+        assert manager.failover_stats["retries"] == 1
+        first = manager.instances["10.0.0.1:1234"]
+        assert first.failed_requests == 1
+        # A refused connection takes the node out of rotation until its next probe
+        assert first.is_healthy == (not isinstance(failure, Exception))
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
+
+def test_rejected_request_is_not_retried_or_counted():
+    async def main():
+        rejecting = failing(400)
+        manager = ordered_cluster([rejecting, lambda request: completion()])
+        with pytest.raises(UpstreamRequestError) as rejected:
+            await manager.aexecute_request(REQUEST)
+        assert rejected.value.status_code == 400
+        assert len(rejecting.calls) == 1
+        first = manager.instances["10.0.0.1:1234"]
+        assert (first.total_requests, first.failed_requests, first.ewma_latency) == (0, 0, 0.0)
+        assert first.key not in manager.instance_metrics
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
+
+def test_retries_stop_when_the_budget_runs_out():
+    async def main():
+        manager = ordered_cluster([failing(500), failing(500), failing(500)])
+        manager.retry_budget = RetryBudget(ratio=0.0, min_per_second=0.0, max_balance=1.0)
+        with pytest.raises(InstanceError):
+            await manager.aexecute_request(REQUEST)
+        assert manager.failover_stats["retries"] == 1
+        assert manager.failover_stats["retries_denied"] == 1
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
+
+def test_retry_budget_refills_from_traffic():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_balance=2.0)
+    assert budget.try_withdraw() and budget.try_withdraw()
+    assert not budget.try_withdraw()
+    budget.deposit()
+    assert not budget.try_withdraw()  # Half a retry's worth
+    budget.deposit()
+    assert budget.try_withdraw()
+
+def test_slow_request_is_hedged_and_the_loser_released():
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def stalled(request):
+            try:
+                await asyncio.sleep(3600)
+            finally:
+                cancelled.set()
+
+        manager = ordered_cluster(
+            [stalled, lambda request: completion("hedge")], hedge_requests=True, hedge_min_delay=0.01
+        )
+        for _ in range(20):
+            manager.cluster_latency.add(0.001)
+
+        result = await manager.aexecute_request(REQUEST)
+        assert result["choices"][0]["message"]["content"] == "hedge"
+        assert (manager.failover_stats["hedges"], manager.failover_stats["hedge_wins"]) == (1, 1)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        # The abandoned primary is neither a failure nor a success
+        first = manager.instances["10.0.0.1:1234"]
+        assert (first.total_requests, first.failed_requests) == (0, 0)
+        assert_idle(manager)
+        await manager.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from rq import SimpleWorker
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import tasks
+from utils import queue_manager
+from utils.queue_manager import AsyncTaskWorker, QueueManager, TaskWorker
+
+class HealthyView:
+    def is_healthy(self, model=None):
+        return True
+
+class InProcessWorker(TaskWorker, SimpleWorker):
+    """TaskWorker that runs jobs in this process, so they see the same fake server"""
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(tasks, "shared_health_view", lambda: HealthyView())
+    manager = QueueManager(redis=fakeredis.FakeRedis())
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Give each new task a creation time one minute after the previous one's"""
+    class Clock(datetime):
+        current = datetime(2026, 1, 1)
+
+        @classmethod
+        def now(cls, tz=None):
+            cls.current += timedelta(minutes=1)
+            return cls.current
+
+    monkeypatch.setattr(queue_manager, "datetime", Clock)
+    return Clock
+
+def run_jobs(manager, max_jobs=None):
+    worker = InProcessWorker([manager.queue], connection=manager.redis)
+    worker.work(burst=True, max_jobs=max_jobs)
+
+def statuses(manager, task_ids):
+    return [status["status"] for status in manager.get_task_statuses(task_ids)]
+
+def test_dependent_is_marked_queued_when_its_parent_finishes(manager):
+    task_ids = manager.enqueue_many([
+        {"type": "agent_task", "payload": {"role": "architect"}},
+        {"type": "agent_task", "payload": {"role": "developer"}, "depends_on": [0]},
+    ])
+    assert statuses(manager, task_ids) == ["queued", "deferred"]
+
+    run_jobs(manager, max_jobs=1)
+    assert statuses(manager, task_ids) == ["finished", "queued"]
+    assert manager.count_tasks(status="queued") == 1
+    assert manager.count_tasks(status="deferred") == 0
+    assert [task["id"] for task in manager.list_tasks(status="queued")] == [task_ids[1]]
+
+    run_jobs(manager)
+    assert statuses(manager, task_ids) == ["finished", "finished"]
+
+def test_chain_runs_in_order(manager):
+    roles = ["architect", "developer", "tester", "deployer"]
+    task_ids = manager.enqueue_many([
+        {"type": "agent_task", "payload": {"role": role}, **({"depends_on": [index - 1]} if index else {})}
+        for index, role in enumerate(roles)
+    ])
+    for finished in range(1, len(roles) + 1):
+        run_jobs(manager, max_jobs=1)
+        expected = ["finished"] * finished + ["queued"][:len(roles) - finished]
+        expected += ["deferred"] * (len(roles) - len(expected))
+        assert statuses(manager, task_ids) == expected
+
+def test_timed_out_thread_keeps_its_slot_until_it_returns(manager):
+    overrun = manager.queue.enqueue(time.sleep, 2, job_timeout=1)
+    follower = manager.queue.enqueue(time.sleep, 0)
+    worker = AsyncTaskWorker([manager.queue], connection=manager.redis, concurrency=1, poll_timeout=1)
+    threading.Timer(2.5, worker.stop).start()
+    worker.work_async()
+
+    overrun.refresh()
+    follower.refresh()
+    assert (overrun.get_status(), follower.get_status()) == ("failed", "finished")
+    # The follower waited for the overrunning thread, not just its timeout
+    assert (follower.started_at - overrun.started_at).total_seconds() >= 1.9
+
+def test_enqueue_records_state_and_indexes(manager):
+    first = manager.enqueue_task("agent_task", {"role": "architect"})
+    second = manager.enqueue_task("agent_task", {"role": "architect"})
+    assert first != second
+    assert first.startswith("agent_task_")
+
+    status = manager.get_task_status(first)
+    assert (status["id"], status["type"], status["status"]) == (first, "agent_task", "queued")
+    assert manager.get_task_statuses([first, "missing"])[1] == {"id": "missing", "status": "not_found"}
+    assert manager.count_tasks() == 2
+    assert manager.count_tasks(status="queued", task_type="agent_task") == 2
+    assert manager.count_tasks(task_type="other_task") == 0
+
+def test_status_indexes_follow_the_task(manager):
+    done = manager.enqueue_task("agent_task", {"role": "architect"})
+    broken = manager.enqueue_task("missing_task", {})
+    run_jobs(manager)
+
+    assert statuses(manager, [done, broken]) == ["finished", "failed"]
+    assert manager.get_task_status(done)["result"] is not None
+    assert manager.get_task_status(broken)["error"]
+    assert manager.count_tasks(status="queued") == 0
+    assert [task["id"] for task in manager.list_tasks(status="finished")] == [done]
+    assert [task["id"] for task in manager.list_tasks(status="failed", task_type="missing_task")] == [broken]
+    assert manager.list_tasks(status="failed", task_type="agent_task") == []
+
+def test_list_tasks_pages_newest_first_and_filters_by_time(manager, clock):
+    task_ids = [manager.enqueue_task("agent_task", {"n": n}) for n in range(5)]
+    other = manager.enqueue_task("other_task", {})
+    newest_first = [other] + task_ids[::-1]
+
+    pages = [manager.list_tasks(offset=offset, limit=2) for offset in (0, 2, 4, 6)]
+    assert [[task["id"] for task in page] for page in pages] == [
+        newest_first[0:2], newest_first[2:4], newest_first[4:6], []
+    ]
+    assert [task["id"] for task in manager.list_tasks(task_type="agent_task", limit=2)] == task_ids[:2:-1]
+
+    created = [clock.fromisoformat(status["created_at"]) for status in manager.get_task_statuses(task_ids)]
+    window = dict(since=created[1], until=created[3].timestamp())
+    assert [task["id"] for task in manager.list_tasks(**window)] == task_ids[3:0:-1]
+    assert manager.count_tasks(task_type="agent_task", **window) == 3
+
+def test_cleanup_removes_old_tasks_and_their_index_entries(manager, clock):
+    old = manager.enqueue_task("agent_task", {})
+    clock.current = datetime.now()
+    recent = manager.enqueue_task("agent_task", {})
+
+    manager.cleanup_old_tasks(max_age_hours=24)
+    assert statuses(manager, [old, recent]) == ["not_found", "queued"]
+    assert [task["id"] for task in manager.list_tasks()] == [recent]
+    assert manager.count_tasks(status="queued", task_type="agent_task") == 1
@@ -0,0 +1,204 @@
+import asyncio
+import gc
+
+import pytest
+
+from utils.single_flight import SingleFlight, StreamFanout, StreamRelay
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+def test_concurrent_callers_share_one_call():
+    async def main():
+        flight = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert runs == 1
+        assert (flight.calls, flight.coalesced) == (1, 4)
+        assert "key" not in flight
+
+        await flight.do("key", work)  # Finished calls aren't reused
+        assert runs == 2
+
+    asyncio.run(main())
+
+def test_work_is_cancelled_only_when_every_caller_leaves():
+    async def main():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def work():
+            started.set()
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "result"
+
+        release.clear()
+        started.clear()
+        only = asyncio.ensure_future(flight.do("other", work))
+        await started.wait()
+        task = flight._calls["other"].task
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
+    asyncio.run(main())
+
+def test_errors_reach_every_caller():
+    async def main():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(main())
+
+def test_late_subscriber_replays_then_follows_live():
+    async def main():
+        step = asyncio.Event()
+
+        async def source():
+            yield b"a"
+            yield b"b"
+            await step.wait()
+            yield b"c"
+
+        done = []
+        fanout = StreamFanout(source(), on_done=lambda: done.append(True))
+        early = asyncio.ensure_future(collect(fanout.subscribe()))
+        while len(fanout.chunks) < 2:
+            await asyncio.sleep(0)
+        late = asyncio.ensure_future(collect(fanout.subscribe()))
+        step.set()
+        assert await early == [b"a", b"b", b"c"]
+        assert await late == [b"a", b"b", b"c"]
+        assert done == [True]
+
+    asyncio.run(main())
+
+def test_source_error_reaches_subscribers():
+    async def main():
+        async def source():
+            yield b"a"
+            raise RuntimeError("connection reset")
+
+        fanout = StreamFanout(source())
+        stream = fanout.subscribe()
+        assert await stream.__anext__() == b"a"
+        with pytest.raises(RuntimeError):
+            await stream.__anext__()
+
+    asyncio.run(main())
+
+def test_source_is_cancelled_when_every_subscriber_leaves():
+    async def main():
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                yield b"a"
+                await asyncio.sleep(3600)
+                yield b"b"
+            finally:
+                closed.set()
+
+        fanout = StreamFanout(source())
+        stream = fanout.subscribe()
+        assert await stream.__anext__() == b"a"
+        await stream.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        assert fanout.done
+
+    asyncio.run(main())
+
+def test_source_runs_to_completion_without_subscribers_reading():
+    async def main():
+        finished = asyncio.Event()
+
+        async def source():
+            yield b"a"
+            finished.set()
+
+        fanout = StreamFanout(source())
+        fanout.subscribe()  # Never iterated, as when a client disconnects before the first chunk
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        assert fanout.done
+
+    asyncio.run(main())
+
+def test_relay_buffers_a_bounded_number_of_chunks():
+    async def main():
+        produced = 0
+
+        async def source():
+            nonlocal produced
+            for n in range(100):
+                produced += 1
+                yield b"%d" % n
+
+        stream = StreamRelay(source(), max_buffered=4).iterate()
+        await asyncio.sleep(0.01)
+        assert produced <= 6  # Four waiting, one blocked on the full buffer
+        assert len(await collect(stream)) == 100
+
+    asyncio.run(main())
+
+def test_relay_passes_errors_through():
+    async def main():
+        async def source():
+            yield b"a"
+            raise RuntimeError("connection reset")
+
+        stream = StreamRelay(source()).iterate()
+        assert await stream.__anext__() == b"a"
+        with pytest.raises(RuntimeError):
+            await stream.__anext__()
+
+    asyncio.run(main())
+
+@pytest.mark.parametrize("started", [True, False])
+def test_relay_closes_the_source_when_the_reader_leaves(started):
+    async def main():
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                yield b"a"
+                await asyncio.sleep(3600)
+                yield b"b"
+            finally:
+                closed.set()
+
+        stream = StreamRelay(source()).iterate()
+        if started:
+            assert await stream.__anext__() == b"a"
+            await stream.aclose()
+        else:
+            del stream  # As when a client disconnects before the first chunk
+            gc.collect()
+        await asyncio.wait_for(closed.wait(), 1)
+
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+class CircuitBreaker:
+    """Per-instance circuit breaker driven by the outcomes of real requests.
+
+    Closed: traffic flows and outcomes are kept for a rolling `window`.
+    The breaker opens once at least `min_requests` have completed in the
+    window and either the error rate reaches `error_threshold` or the share
+    of slow calls reaches `slow_call_rate`. A call is slow if its first token
+    took `slow_call_threshold` seconds or more, or it spent at least
+    `slow_token_threshold` seconds per prompt and completion token, so long
+    generations don't count as slow just for being long.
+
+    Open: no traffic for `open_duration` seconds, doubling on each
+    consecutive trip up to `max_open_duration`.
+
+    Half-open: up to `half_open_max_calls` probe requests are let through.
+    A success closes the breaker and a failure reopens it.
+
+    Not thread-safe on its own; callers serialise access (the cluster lock).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: float = 60.0, min_requests: int = 10, error_threshold: float = 0.5,
+                 slow_call_threshold: float = 120.0, slow_token_threshold: float = 0.5,
+                 slow_call_rate: float = 0.5,
+                 open_duration: float = 15.0, max_open_duration: float = 300.0,
+                 half_open_max_calls: int = 1,
+                 on_transition: Optional[Callable[[str, str, str], None]] = None):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_token_threshold = slow_token_threshold
+        self.slow_call_rate = slow_call_rate
+        self.open_duration = open_duration
+        self.max_open_duration = max_open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.on_transition = on_transition
+
+        self.state = self.CLOSED
+        self._outcomes: deque = deque()  # (time.monotonic(), failed, slow)
+        self._opened_until = 0.0
+        self._consecutive_trips = 0
+        self._half_open_calls = 0
+        self.transitions: deque = deque(maxlen=20)
+
+    def _transition(self, state: str, reason: str):
+        previous, self.state = self.state, state
+        self.transitions.append({
+            "time": datetime.now().isoformat(),
+            "from": previous,
+            "to": state,
+            "reason": reason
+        })
+        if self.on_transition:
+            self.on_transition(previous, state, reason)
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """Whether a request could be sent now; doesn't change state"""
+        now = time.monotonic() if now is None else now
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now >= self._opened_until
+        return self._half_open_calls < self.half_open_max_calls
+
+    def on_dispatch(self, now: Optional[float] = None):
+        """Note that a request was sent, moving an expired open breaker to half-open"""
+        now = time.monotonic() if now is None else now
+        if self.state == self.OPEN and now >= self._opened_until:
+            self._transition(self.HALF_OPEN, "cooldown elapsed")
+            self._half_open_calls = 0
+        if self.state == self.HALF_OPEN:
+            self._half_open_calls += 1
+
+    def on_abandoned(self):
+        """A dispatched request ended with no verdict on the node, e.g. the caller left or it got a 4xx"""
+        if self.state == self.HALF_OPEN and self._half_open_calls:
+            self._half_open_calls -= 1
+
+    def record(self, success: bool, ttft: Optional[float] = None,
+               seconds_per_token: Optional[float] = None, now: Optional[float] = None):
+        """Record the outcome of a dispatched request and how responsive it was, where known"""
+        now = time.monotonic() if now is None else now
+        slow = (
+            (ttft is not None and ttft >= self.slow_call_threshold) or
+            (seconds_per_token is not None and seconds_per_token >= self.slow_token_threshold)
+        )
+
+        if self.state == self.HALF_OPEN:
+            self._half_open_calls = max(0, self._half_open_calls - 1)
+            if success and not slow:
+                self._consecutive_trips = 0
+                self._outcomes.clear()
+                self._transition(self.CLOSED, "probe succeeded")
+            else:
+                self._trip(now, "probe failed" if not success else "probe was slow")
+            return
+        if self.state == self.OPEN:
+            # Stragglers dispatched before the breaker opened
+            return
+
+        self._outcomes.append((now, not success, slow))
+        self._trim(now)
+        total = len(self._outcomes)
+        if total < self.min_requests:
+            return
+        error_rate = sum(1 for _, failed, _ in self._outcomes if failed) / total
+        slow_rate = sum(1 for _, _, is_slow in self._outcomes if is_slow) / total
+        if error_rate >= self.error_threshold:
+            self._trip(now, f"error rate {error_rate:.0%} over {total} requests")
+        elif slow_rate >= self.slow_call_rate:
+            self._trip(now, f"{slow_rate:.0%} of {total} requests were slow")
+
+    def _trip(self, now: float, reason: str):
+        duration = min(self.open_duration * (2 ** self._consecutive_trips), self.max_open_duration)
+        self._consecutive_trips += 1
+        self._opened_until = now + duration
+        self._outcomes.clear()
+        self._half_open_calls = 0
+        self._transition(self.OPEN, f"{reason}; open for {duration:.0f}s")
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._trim(now)
+        total = len(self._outcomes)
+        return {
+            "state": self.state,
+            "window_requests": total,
+            "window_error_rate": sum(1 for _, failed, _ in self._outcomes if failed) / total if total else 0.0,
+            "open_for": max(0.0, self._opened_until - now) if self.state == self.OPEN else 0.0,
+            "transitions": list(self.transitions)
+        }
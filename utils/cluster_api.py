@@ -1,42 +1,152 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional
-from .llm_cluster import LLMClusterManager
+from typing import Dict, List, Optional, Tuple
+from .fair_queue import priority_class
+from .llm_cluster import ClusterSaturatedError, LLMClusterManager, UpstreamRequestError
+from config.config import CLUSTER_CONFIG
+import asyncio
+import hashlib
+import json
 import logging
 
-app = FastAPI()
-cluster = LLMClusterManager()
 logger = logging.getLogger("ClusterAPI")
 
+# Created on startup rather than import, so importing this module touches no network
+cluster: Optional[LLMClusterManager] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global cluster
+    cluster = LLMClusterManager(**CLUSTER_CONFIG)
+    await asyncio.to_thread(cluster.start)
+    try:
+        yield
+    finally:
+        await cluster.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
 class ChatRequest(BaseModel):
     model: str
     messages: List[Dict[str, str]]
     temperature: Optional[float] = 1.0
     max_tokens: Optional[int] = None
+    stream: Optional[bool] = False
+    seed: Optional[int] = None
+
+class BatchRequest(BaseModel):
+    requests: List[ChatRequest]
+    max_concurrency: Optional[int] = None  # Defaults to the cluster's total per-node limits
+
+def cache_directives(cache_control: Optional[str]) -> Tuple[bool, bool]:
+    """Map a Cache-Control header to (read_cache, write_cache)"""
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    if "no-store" in directives:
+        return False, False
+    if "no-cache" in directives:
+        return False, True
+    return True, True
+
+def caller_identity(x_caller: Optional[str], authorization: Optional[str]) -> str:
+    """Key for fair sharing of the queue: X-Caller, else a digest of the API key"""
+    if x_caller and x_caller.strip():
+        return x_caller.strip()
+    if authorization and authorization.strip():
+        token = authorization.strip()
+        if token.lower().startswith("bearer "):
+            token = token[7:].strip()
+        return "key:" + hashlib.sha256(token.encode()).hexdigest()[:12]
+    return "anonymous"
+
+def request_class(x_priority: Optional[str], default: str) -> str:
+    try:
+        return priority_class(x_priority, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/v1/chat/completions")
-async def chat_completion(request: ChatRequest):
+async def chat_completion(request: ChatRequest, cache_control: Optional[str] = Header(None),
+                          x_priority: Optional[str] = Header(None), x_caller: Optional[str] = Header(None),
+                          authorization: Optional[str] = Header(None)):
+    priority = request_class(x_priority, "normal")
+    caller = caller_identity(x_caller, authorization)
     try:
-        response = cluster.execute_request(request.dict())
+        request_data = request.dict(exclude_none=True)
+        if request.stream:
+            stream = await cluster.astream_request(request_data, priority=priority, caller=caller)
+            return StreamingResponse(stream, media_type="text/event-stream")
+        read_cache, write_cache = cache_directives(cache_control)
+        response = await cluster.aexecute_request(
+            request_data, read_cache=read_cache, write_cache=write_cache,
+            priority=priority, caller=caller
+        )
         return response
+    except ClusterSaturatedError as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except UpstreamRequestError as e:
+        # The backend rejected the request itself; pass its status and error through
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         logger.error(f"Chat completion error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/v1/batch/chat/completions")
+async def batch_chat_completion(batch: BatchRequest, x_priority: Optional[str] = Header(None),
+                                x_caller: Optional[str] = Header(None),
+                                authorization: Optional[str] = Header(None)):
+    """Fan a list of chat requests across the cluster.
+
+    Results stream back as newline-delimited JSON in completion order, one
+    line per item with its index and status, then a summary line with the
+    aggregate throughput. Batch items queue in the batch priority class
+    unless X-Priority says otherwise.
+    """
+    priority = request_class(x_priority, "batch")
+    caller = caller_identity(x_caller, authorization)
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Batch contains no requests")
+    requests_data = [{**r.dict(exclude_none=True), "stream": False} for r in batch.requests]
+
+    async def results():
+        async for item in cluster.abatch_execute(
+            requests_data, priority=priority, concurrency=batch.max_concurrency, caller=caller
+        ):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/v1/models")
+async def list_models():
+    """List the models loaded anywhere in the cluster"""
+    return {
+        "object": "list",
+        "data": [{"id": model, "object": "model"} for model in cluster.list_models()]
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for the gateway; scraping never takes the routing lock"""
+    return Response(cluster.metrics.render(), media_type=cluster.metrics.content_type)
+
 @app.get("/cluster/status")
 async def get_cluster_status():
     """Get the current status of all LMStudio instances"""
     return cluster.get_cluster_status()
 
 @app.get("/cluster/best_instance")
-async def get_best_instance():
+async def get_best_instance(model: Optional[str] = None):
     """Get information about the currently best available instance"""
-    instance = cluster.get_best_instance()
+    instance = cluster.get_best_instance(model)
     if not instance:
         raise HTTPException(status_code=503, detail="No healthy instances available")
     return {
         "host": instance.host,
         "load": instance.current_load,
         "queue_length": instance.queue_length,
-        "avg_response_time": instance.avg_response_time
+        "avg_response_time": instance.avg_response_time,
+        "models": instance.models
     }
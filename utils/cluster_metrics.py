@@ -0,0 +1,105 @@
+from typing import Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Enum, Gauge, Histogram, generate_latest
+)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PROBE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+DISCOVERY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+class ClusterMetrics:
+    """Prometheus collectors for the cluster gateway.
+
+    Every metric is updated at the point the event happens, and the client
+    library guards each one with its own lock, so rendering a scrape never
+    touches the cluster manager's routing lock. Each manager gets its own
+    registry so several can live in one process.
+    """
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None, namespace: str = "llm_cluster"):
+        self.registry = registry or CollectorRegistry()
+        options = {"namespace": namespace, "registry": self.registry}
+
+        # Requests
+        self.requests = Counter(
+            "requests", "Upstream requests by instance, model and outcome",
+            ["instance", "model", "outcome"], **options
+        )
+        self.in_flight = Gauge(
+            "in_flight_requests", "Requests currently dispatched to an instance",
+            ["instance"], **options
+        )
+        self.outstanding_tokens = Gauge(
+            "outstanding_tokens", "Predicted prompt + completion tokens of in-flight requests",
+            ["instance"], **options
+        )
+        self.request_duration = Histogram(
+            "request_duration_seconds", "Time from dispatch to a complete upstream response",
+            ["model"], buckets=LATENCY_BUCKETS, **options
+        )
+        self.time_to_first_token = Histogram(
+            "time_to_first_token_seconds", "Time from dispatch to the first streamed token",
+            ["model"], buckets=TTFT_BUCKETS, **options
+        )
+        self.tokens = Counter(
+            "tokens", "Tokens processed by model and kind (prompt or completion)",
+            ["model", "kind"], **options
+        )
+
+        # Admission control
+        self.queue_depth = Gauge(
+            "admission_queue_depth", "Requests waiting for a free instance slot by priority class",
+            ["priority_class"], **options
+        )
+        self.queue_wait = Histogram(
+            "admission_queue_wait_seconds", "Time requests spent in the admission queue by priority class",
+            ["priority_class"], buckets=QUEUE_WAIT_BUCKETS, **options
+        )
+        self.admission_rejections = Counter(
+            "admission_rejections", "Requests rejected with 429 by reason",
+            ["reason"], **options
+        )
+
+        # Failover and hedging
+        self.retries = Counter(
+            "retries", "Retry decisions by result (allowed or denied by the budget)",
+            ["result"], **options
+        )
+        self.hedges = Counter("hedges", "Hedged requests sent", **options)
+        self.hedge_wins = Counter("hedge_wins", "Hedged requests that beat the original", **options)
+
+        # Instances
+        self.instance_up = Gauge(
+            "instance_up", "Whether the instance passed its last health check",
+            ["instance"], **options
+        )
+        self.circuit_state = Enum(
+            "circuit_state", "Circuit breaker state per instance",
+            ["instance"], states=["closed", "open", "half_open"], **options
+        )
+        self.health_check_duration = Histogram(
+            "health_check_duration_seconds", "Time to probe one instance",
+            buckets=PROBE_BUCKETS, **options
+        )
+        self.discovery_duration = Histogram(
+            "discovery_duration_seconds", "Time for one network discovery pass",
+            buckets=DISCOVERY_BUCKETS, **options
+        )
+
+        # Response cache and coalescing
+        self.cache_lookups = Counter(
+            "cache_lookups", "Response cache lookups by result (hit, miss or bypass)",
+            ["result"], **options
+        )
+        self.coalesced_requests = Counter(
+            "coalesced_requests", "Requests served by another request's upstream call",
+            ["mode"], **options
+        )
+
+    def render(self) -> bytes:
+        """The registry in the Prometheus text exposition format"""
+        return generate_latest(self.registry)
+
+    content_type = CONTENT_TYPE_LATEST
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+def new_gateway_id() -> str:
+    """Identify this gateway process among its peers"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class ClusterState:
+    """State shared by every gateway in front of the same cluster.
+
+    One gateway holds a renewable leader lease and is the only one to scan
+    and probe; it publishes the instance health table for the others. Every
+    gateway publishes its own in-flight counts so each can route on the
+    cluster-wide load. Entries from gateways that stopped publishing expire
+    after `load_ttl` seconds, and the lease after `lease_ttl`.
+    """
+
+    def __init__(self, gateway_id: Optional[str] = None, lease_ttl: float = 10.0,
+                 load_ttl: float = 5.0):
+        self.gateway_id = gateway_id or new_gateway_id()
+        self.lease_ttl = lease_ttl
+        self.load_ttl = load_ttl
+
+    def try_lead(self) -> bool:
+        """Take or renew the leader lease; True if this gateway holds it"""
+        raise NotImplementedError
+
+    def publish_health(self, instances: Dict[str, Dict[str, Any]]):
+        """Publish the leader's instance table"""
+        raise NotImplementedError
+
+    def read_health(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """The last instance table published by a leader, or None if there is none"""
+        raise NotImplementedError
+
+    def publish_load(self, in_flight: Dict[str, int]):
+        """Publish this gateway's in-flight requests per instance"""
+        raise NotImplementedError
+
+    def read_remote_load(self) -> Dict[str, int]:
+        """In-flight requests per instance summed over the other live gateways"""
+        raise NotImplementedError
+
+    def peers(self) -> int:
+        """Live gateways other than this one, as of the last load read"""
+        raise NotImplementedError
+
+    def close(self):
+        """Give up the lease and withdraw this gateway's load"""
+        raise NotImplementedError
+
+class LocalClusterState(ClusterState):
+    """In-process stand-in for RedisClusterState.
+
+    Gateways share state by sharing the object, e.g. several managers in one
+    process, or a single gateway that wants the same code path without Redis.
+    """
+
+    def __init__(self, gateway_id: Optional[str] = None, lease_ttl: float = 10.0,
+                 load_ttl: float = 5.0, store: Optional[Dict[str, Any]] = None):
+        super().__init__(gateway_id, lease_ttl, load_ttl)
+        self._store = store if store is not None else {"leader": None, "health": None, "load": {}}
+        self._lock = self._store.setdefault("lock", threading.Lock())
+        self._peers = 0
+
+    def for_gateway(self, gateway_id: Optional[str] = None) -> "LocalClusterState":
+        """A handle on the same shared state for another gateway"""
+        return LocalClusterState(gateway_id, self.lease_ttl, self.load_ttl, self._store)
+
+    def try_lead(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            leader = self._store["leader"]
+            if leader is None or leader[0] == self.gateway_id or leader[1] <= now:
+                self._store["leader"] = (self.gateway_id, now + self.lease_ttl)
+                return True
+            return False
+
+    def publish_health(self, instances: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            self._store["health"] = json.loads(json.dumps(instances))
+
+    def read_health(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            return self._store["health"]
+
+    def publish_load(self, in_flight: Dict[str, int]):
+        with self._lock:
+            self._store["load"][self.gateway_id] = (time.monotonic(), dict(in_flight))
+
+    def read_remote_load(self) -> Dict[str, int]:
+        now = time.monotonic()
+        totals: Dict[str, int] = {}
+        with self._lock:
+            load = self._store["load"]
+            for gateway_id, (published, counts) in list(load.items()):
+                if published + self.load_ttl <= now:
+                    del load[gateway_id]
+                elif gateway_id != self.gateway_id:
+                    for key, count in counts.items():
+                        totals[key] = totals.get(key, 0) + count
+            self._peers = len([g for g in load if g != self.gateway_id])
+        return totals
+
+    def peers(self) -> int:
+        return self._peers
+
+    def close(self):
+        with self._lock:
+            leader = self._store["leader"]
+            if leader and leader[0] == self.gateway_id:
+                self._store["leader"] = None
+            self._store["load"].pop(self.gateway_id, None)
+
+# Renew the lease only if this gateway still holds it
+_RENEW_LEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Give up the lease only if this gateway still holds it
+_RELEASE_LEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+class RedisClusterState(ClusterState):
+    """Cluster state kept in Redis, for gateways in separate processes or hosts.
+
+    Keys live under `namespace`: a leader lease string, a JSON health table
+    written by the leader, and a hash of per-gateway load snapshots.
+    Connections made from `redis_url` give up after `socket_timeout`
+    seconds, so an unreachable Redis fails a sync round instead of
+    stalling the health and routing paths that call into it.
+    """
+
+    def __init__(self, redis_url: str = "redis://localhost:6379", namespace: str = "llm_cluster",
+                 gateway_id: Optional[str] = None, lease_ttl: float = 10.0, load_ttl: float = 5.0,
+                 redis=None, socket_timeout: float = 1.0):
+        super().__init__(gateway_id, lease_ttl, load_ttl)
+        if redis is None:
+            from redis import Redis
+            redis = Redis.from_url(redis_url, socket_timeout=socket_timeout,
+                                   socket_connect_timeout=socket_timeout)
+        self.redis = redis
+        self.leader_key = f"{namespace}:leader"
+        self.health_key = f"{namespace}:health"
+        self.load_key = f"{namespace}:load"
+        self._renew = self.redis.register_script(_RENEW_LEASE)
+        self._release = self.redis.register_script(_RELEASE_LEASE)
+        self._peers = 0
+        self.logger = logging.getLogger("ClusterState")
+
+    def try_lead(self) -> bool:
+        ttl_ms = int(self.lease_ttl * 1000)
+        if self._renew(keys=[self.leader_key], args=[self.gateway_id, ttl_ms]):
+            return True
+        return bool(self.redis.set(self.leader_key, self.gateway_id, nx=True, px=ttl_ms))
+
+    def publish_health(self, instances: Dict[str, Dict[str, Any]]):
+        # Outlive the lease so followers keep the table while a new leader takes over
+        self.redis.set(self.health_key, json.dumps(instances), px=int(self.lease_ttl * 3000))
+
+    def read_health(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        payload = self.redis.get(self.health_key)
+        return json.loads(payload) if payload else None
+
+    def publish_load(self, in_flight: Dict[str, int]):
+        snapshot = json.dumps({"at": time.time(), "in_flight": in_flight})
+        self.redis.hset(self.load_key, self.gateway_id, snapshot)
+
+    def read_remote_load(self) -> Dict[str, int]:
+        now = time.time()
+        totals: Dict[str, int] = {}
+        stale, peers = [], 0
+        for gateway_id, payload in self.redis.hgetall(self.load_key).items():
+            gateway_id = gateway_id.decode() if isinstance(gateway_id, bytes) else gateway_id
+            snapshot = json.loads(payload)
+            if snapshot["at"] + self.load_ttl <= now:
+                stale.append(gateway_id)
+            elif gateway_id != self.gateway_id:
+                peers += 1
+                for key, count in snapshot["in_flight"].items():
+                    totals[key] = totals.get(key, 0) + count
+        if stale:
+            self.redis.hdel(self.load_key, *stale)
+        self._peers = peers
+        return totals
+
+    def peers(self) -> int:
+        return self._peers
+
+    def close(self):
+        try:
+            self._release(keys=[self.leader_key], args=[self.gateway_id])
+            self.redis.hdel(self.load_key, self.gateway_id)
+        except Exception as e:
+            self.logger.warning(f"Could not withdraw gateway {self.gateway_id}: {str(e)}")
@@ -0,0 +1,127 @@
+import heapq
+import itertools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+# Served strictly in this order: a class only gets slots nobody above it can use
+PRIORITY_CLASSES = ("interactive", "normal", "batch")
+
+def priority_class(value: Union[str, int, None], default: str = "normal") -> str:
+    """Normalise a class name or a numeric priority (>0 interactive, 0 normal, <0 batch)"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        name = value.strip().lower()
+        if name in PRIORITY_CLASSES:
+            return name
+        try:
+            value = int(name)
+        except ValueError:
+            raise ValueError(
+                f"Unknown priority class {value!r}, expected one of {list(PRIORITY_CLASSES)}"
+            )
+    return "interactive" if value > 0 else "batch" if value < 0 else "normal"
+
+class FairQueue:
+    """Admission queue with strict priority classes and per-caller fair sharing.
+
+    Within a class, callers are served by deficit round robin: each visit
+    credits a caller `quantum` predicted tokens and it may take requests
+    while their predicted cost fits its credit, so one caller flooding the
+    queue gets the same share of tokens as one sending a trickle. Each
+    caller's own requests are taken in `order_key` order.
+    """
+
+    def __init__(self, quantum: int = 2048):
+        self.quantum = quantum
+        # class -> caller -> heap of (order key, sequence, cost, item), callers in round robin order
+        self._queues: Dict[str, "OrderedDict[str, List[Tuple[float, int, int, Any]]]"] = {
+            name: OrderedDict() for name in PRIORITY_CLASSES
+        }
+        self._deficits: Dict[Tuple[str, str], float] = {}
+        # class -> caller whose turn was cut short by a lack of capacity; it resumes without new credit
+        self._turns: Dict[str, str] = {}
+        self._locations: Dict[int, Tuple[str, str]] = {}  # id(item) -> (class, caller)
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def items(self) -> List[Any]:
+        return [entry[-1] for callers in self._queues.values() for heap in callers.values() for entry in heap]
+
+    def depth(self, name: str) -> int:
+        return sum(len(heap) for heap in self._queues[name].values())
+
+    def callers(self, name: str) -> int:
+        return len(self._queues[name])
+
+    def push(self, item: Any, name: str, caller: str, cost: int, order_key: float):
+        heapq.heappush(
+            self._queues[name].setdefault(caller, []),
+            (order_key, next(self._sequence), max(1, cost), item)
+        )
+        self._locations[id(item)] = (name, caller)
+
+    def remove(self, item: Any) -> bool:
+        """Drop an item if it is still queued"""
+        location = self._locations.pop(id(item), None)
+        if location is None:
+            return False
+        name, caller = location
+        heap = self._queues[name][caller]
+        heap[:] = [entry for entry in heap if entry[-1] is not item]
+        heapq.heapify(heap)
+        if not heap:
+            del self._queues[name][caller]
+            self._deficits.pop(location, None)
+            if self._turns.get(name) == caller:
+                del self._turns[name]
+        return True
+
+    def schedule(self, offer: Callable[[Any], Optional[bool]]) -> int:
+        """Offer queued items to `offer` in scheduling order and return how many it took.
+
+        `offer` returns True if it took the item (it leaves the queue), False
+        if the item can't be placed right now (its caller is skipped for the
+        rest of the pass), or None to end the pass (no capacity left).
+        """
+        taken = 0
+        for name in PRIORITY_CLASSES:
+            callers = self._queues[name]
+            blocked: Set[str] = set()
+            while any(caller not in blocked for caller in callers):
+                for caller in list(callers):
+                    if caller in blocked:
+                        continue
+                    heap = callers[caller]
+                    key = (name, caller)
+                    resumed = self._turns.pop(name, None) == caller
+                    deficit = self._deficits.get(key, 0.0) + (0 if resumed else self.quantum)
+                    took = False
+                    while heap and heap[0][2] <= deficit:
+                        result = offer(heap[0][-1])
+                        if result is None:
+                            if took or resumed:
+                                self._deficits[key] = deficit
+                                self._turns[name] = caller
+                            else:
+                                self._deficits[key] = deficit - self.quantum
+                            return taken
+                        if not result:
+                            blocked.add(caller)
+                            break
+                        _, _, cost, item = heapq.heappop(heap)
+                        del self._locations[id(item)]
+                        deficit -= cost
+                        taken += 1
+                        took = True
+                    if not heap:
+                        del callers[caller]
+                        self._deficits.pop(key, None)  # Credit doesn't carry over an idle period
+                        continue
+                    # A caller that couldn't be placed doesn't bank this visit's credit
+                    banked = took or resumed or caller not in blocked
+                    self._deficits[key] = deficit if banked else deficit - self.quantum
+                    callers.move_to_end(caller)
+        return taken
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+class HealthView:
+    """Cached view of which LMStudio backends can take work, shared by a process.
+
+    A background thread refreshes the snapshot every `ttl` seconds from the
+    first source that answers:
+    - `redis_url`: the instance table the cluster gateway's leader publishes
+      in Redis (one GET)
+    - `gateway_url`: the gateway's /cluster/status
+    - `base_url`: LMStudio's /models listing, which needs no generation
+    Callers read the snapshot from memory. If the refresher stalls and the
+    snapshot is older than `max_age`, the next caller refreshes it inline.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, gateway_url: Optional[str] = None,
+                 redis_url: Optional[str] = None, api_key: Optional[str] = None,
+                 ttl: float = 5.0, max_age: float = 30.0, timeout: float = 2.0):
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.gateway_url = gateway_url.rstrip("/") if gateway_url else None
+        self.api_key = api_key
+        self.ttl = ttl
+        self.max_age = max_age
+        self.timeout = timeout
+        self.logger = logging.getLogger("HealthView")
+        self.shared_state = None
+        if redis_url:
+            from .cluster_state import RedisClusterState
+            self.shared_state = RedisClusterState(redis_url)
+        # Replaced wholesale on refresh, so reads need no lock (and none can be
+        # left held across a fork by a forking worker)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refreshing = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="HealthView", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The current snapshot, refreshed inline only if missing or older than max_age"""
+        snapshot = self._snapshot
+        if snapshot is None or time.time() - snapshot["checked_at"] > self.max_age:
+            snapshot = self.refresh()
+        return snapshot
+
+    def is_healthy(self, model: Optional[str] = None) -> bool:
+        """True if some healthy instance can serve `model` (any model if None)"""
+        for instance in self.snapshot()["instances"].values():
+            if instance["healthy"] and (model is None or not instance["models"] or model in instance["models"]):
+                return True
+        return False
+
+    def refresh(self) -> Dict[str, Any]:
+        """Read every source in turn and publish the first answer"""
+        if not self._refreshing.acquire(blocking=self._snapshot is None):
+            return self._snapshot  # Another thread is already refreshing
+        try:
+            errors = []
+            for source, read in (("redis", self._read_shared_state), ("gateway", self._read_gateway),
+                                 ("lmstudio", self._read_models)):
+                try:
+                    instances = read()
+                except Exception as e:
+                    errors.append(f"{source}: {str(e)}")
+                    continue
+                if instances is not None:
+                    self._snapshot = {"instances": instances, "source": source,
+                                      "checked_at": time.time(), "error": None}
+                    break
+            else:
+                self._snapshot = {"instances": {}, "source": None, "checked_at": time.time(),
+                                  "error": "; ".join(errors) or "No health source configured"}
+            return self._snapshot
+        finally:
+            self._refreshing.release()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            snapshot = self.refresh()
+            if snapshot["error"]:
+                self.logger.warning(f"No LMStudio health available: {snapshot['error']}")
+            self._stop.wait(self.ttl)
+
+    def _read_shared_state(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        if self.shared_state is None:
+            return None
+        table = self.shared_state.read_health()  # None when no gateway leader is publishing
+        if table is None:
+            return None
+        return {key: {"healthy": data["healthy"], "models": data.get("models") or []}
+                for key, data in table.items()}
+
+    def _read_gateway(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        if not self.gateway_url:
+            return None
+        response = requests.get(f"{self.gateway_url}/cluster/status", timeout=self.timeout)
+        response.raise_for_status()
+        return {key: {"healthy": data["healthy"], "models": data.get("models") or []}
+                for key, data in response.json()["instances"].items()}
+
+    def _read_models(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        if not self.base_url:
+            return None
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = requests.get(f"{self.base_url}/models", headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        models = [model["id"] for model in response.json().get("data", [])]
+        return {self.base_url: {"healthy": True, "models": models}}
+
+_shared_view: Optional[HealthView] = None
+_shared_view_lock = threading.Lock()
+
+def shared_health_view() -> HealthView:
+    """The process-wide HealthView configured from config.config, started on first use"""
+    global _shared_view
+    if _shared_view is None:
+        with _shared_view_lock:
+            if _shared_view is None:
+                from config.config import CLUSTER_CONFIG, LMSTUDIO_CONFIG
+                view = HealthView(
+                    base_url=LMSTUDIO_CONFIG["base_url"],
+                    gateway_url=LMSTUDIO_CONFIG["gateway_url"],
+                    redis_url=CLUSTER_CONFIG["shared_state"],
+                    api_key=LMSTUDIO_CONFIG["api_key"],
+                    ttl=LMSTUDIO_CONFIG["health_ttl"]
+                )
+                view.start()
+                _shared_view = view
+    return _shared_view
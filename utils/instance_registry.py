@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+@dataclass
+class InstanceSpec:
+    """One declared LMStudio node"""
+    host: str
+    port: int
+    weight: float = 1.0
+    max_concurrency: Optional[int] = None
+    models: Optional[List[str]] = None  # Seeds the model index until the node reports its own
+
+    @property
+    def key(self) -> str:
+        return f"{self.host}:{self.port}"
+
+def parse_instances(data: Any, default_port: int = 1234) -> List[InstanceSpec]:
+    """Build specs from parsed registry data.
+
+    Accepts either a list or a mapping with an "instances" list. Each entry is a
+    "host[:port]" string or a mapping with host, port, weight, max_concurrency
+    and models.
+    """
+    if isinstance(data, dict):
+        data = data.get("instances") or []
+    if not isinstance(data, list):
+        raise ValueError("Instance registry must be a list or contain an 'instances' list")
+
+    specs: Dict[str, InstanceSpec] = {}
+    for entry in data:
+        if isinstance(entry, str):
+            entry = {"host": entry}
+        if not isinstance(entry, dict) or not entry.get("host"):
+            raise ValueError(f"Invalid instance entry: {entry!r}")
+        host, port = _split_host(str(entry["host"]), entry.get("port") or default_port)
+        weight = float(entry.get("weight", 1.0))
+        if weight <= 0:
+            raise ValueError(f"Instance {host}:{port} must have a positive weight")
+        max_concurrency = entry.get("max_concurrency")
+        models = entry.get("models")
+        spec = InstanceSpec(
+            host=host,
+            port=port,
+            weight=weight,
+            max_concurrency=int(max_concurrency) if max_concurrency else None,
+            models=[str(model) for model in models] if models is not None else None
+        )
+        specs[spec.key] = spec
+    return list(specs.values())
+
+def _split_host(host: str, port: int) -> Tuple[str, int]:
+    """Split "host:port", falling back to `port` when none is given"""
+    if "://" in host:
+        host = host.split("://", 1)[1]
+    host = host.split("/", 1)[0]
+    if host.count(":") == 1:
+        host, port = host.split(":")
+    return host, int(port)
+
+def load_registry_file(path: Union[str, Path], default_port: int = 1234) -> List[InstanceSpec]:
+    """Read a JSON or YAML registry file"""
+    path = Path(path)
+    text = path.read_text()
+    if path.suffix.lower() in (".yaml", ".yml"):
+        import yaml  # Only needed for YAML registries
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    return parse_instances(data or [], default_port)
+
+def load_registry_env(value: str, default_port: int = 1234) -> List[InstanceSpec]:
+    """Read a registry from an environment variable.
+
+    The value is either JSON in the file format or a comma-separated list of
+    "host[:port]" entries.
+    """
+    value = value.strip()
+    if value.startswith(("[", "{")):
+        return parse_instances(json.loads(value), default_port)
+    return parse_instances([entry.strip() for entry in value.split(",") if entry.strip()], default_port)
+
+class InstanceRegistry:
+    """Declared instances from a file and/or an environment variable.
+
+    The file is re-read whenever its modification time or size changes, so
+    edits take effect without a restart. A file that is missing or fails to
+    parse on the first load raises, so a gateway doesn't start with no
+    instances; later failures, including the file being deleted, are logged
+    and the last good version stays in force.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None,
+                 env_var: str = "LLM_CLUSTER_INSTANCES", default_port: int = 1234):
+        self.path = Path(path) if path else None
+        self.env_value = os.getenv(env_var, "")
+        self.default_port = default_port
+        self.logger = logging.getLogger("InstanceRegistry")
+        self._signature: Optional[Tuple[float, int]] = None
+        self._loaded = False
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.path or self.env_value.strip())
+
+    def poll(self) -> Optional[List[InstanceSpec]]:
+        """The full set of declared instances if it changed since the last call, else None"""
+        signature = None
+        if self.path:
+            try:
+                stat = self.path.stat()
+                signature = (stat.st_mtime, stat.st_size)
+            except OSError:
+                signature = None
+        if self._loaded and signature == self._signature:
+            return None
+
+        try:
+            specs = load_registry_env(self.env_value, self.default_port) if self.env_value.strip() else []
+            if self.path and signature is None:
+                raise FileNotFoundError(f"Instance registry {self.path} not found")
+            if self.path:
+                specs += load_registry_file(self.path, self.default_port)
+        except Exception as e:
+            if not self._loaded:
+                raise ValueError(f"Could not load instance registry: {str(e)}") from e
+            self.logger.error(f"Could not load instance registry: {str(e)}")
+            self._signature = signature  # Don't retry until the file changes again
+            self._loaded = True
+            return None
+
+        self._signature = signature
+        self._loaded = True
+        return list({spec.key: spec for spec in specs}.values())
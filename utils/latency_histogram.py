@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+class LogHistogram:
+    """Fixed-memory histogram with logarithmic buckets, in the style of DDSketch.
+
+    Every quantile it reports is within `relative_accuracy` of the true value
+    for samples between `min_value` and `max_value`. Smaller samples are
+    counted as zero and larger ones are clamped to the top bucket. Buckets
+    are stored sparsely, so an empty or narrow histogram costs almost nothing.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, min_value: float = 1e-4,
+                 max_value: float = 1e6):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        self.max_index = math.ceil(math.log(max_value) / self._log_gamma) - self._offset
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value < self.min_value:
+            self.zero_count += 1
+            return
+        index = min(math.ceil(math.log(value) / self._log_gamma) - self._offset, self.max_index)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "LogHistogram"):
+        self.count += other.count
+        self.sum += other.sum
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket, which bounds the relative error
+                return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+        return 2 * self.gamma ** (self.max_index + self._offset) / (self.gamma + 1)
+
+class RollingHistogram:
+    """LogHistogram over a sliding time window.
+
+    The window is split into `slots` sub-histograms that are recycled as time
+    moves on, so memory stays fixed and old samples age out in steps of
+    window / slots seconds.
+    """
+
+    def __init__(self, window: float = 60.0, slots: int = 12, **histogram_options):
+        self.window = window
+        self.slots = slots
+        self.slot_seconds = window / slots
+        self._histogram_options = histogram_options
+        self._histograms: List[LogHistogram] = [LogHistogram(**histogram_options) for _ in range(slots)]
+        self._epochs: List[int] = [-1] * slots
+        self._lock = threading.Lock()
+
+    def add(self, value: float, now: Optional[float] = None):
+        epoch = int((time.monotonic() if now is None else now) / self.slot_seconds)
+        slot = epoch % self.slots
+        with self._lock:
+            if self._epochs[slot] != epoch:
+                self._histograms[slot] = LogHistogram(**self._histogram_options)
+                self._epochs[slot] = epoch
+            self._histograms[slot].add(value)
+
+    def snapshot(self, now: Optional[float] = None) -> LogHistogram:
+        """Merge the slots still inside the window"""
+        epoch = int((time.monotonic() if now is None else now) / self.slot_seconds)
+        merged = LogHistogram(**self._histogram_options)
+        with self._lock:
+            for slot_epoch, histogram in zip(self._epochs, self._histograms):
+                if epoch - self.slots < slot_epoch <= epoch:
+                    merged.merge(histogram)
+        return merged
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        histogram = self.snapshot(now)
+        return {
+            "count": histogram.count,
+            "mean": histogram.sum / histogram.count if histogram.count else None,
+            "p50": histogram.quantile(0.50),
+            "p95": histogram.quantile(0.95),
+            "p99": histogram.quantile(0.99)
+        }
+
+class RequestMetrics:
+    """Rolling distributions for one instance or one model"""
+
+    NAMES = ("latency", "ttft", "queue_wait", "prompt_tokens_per_second", "completion_tokens_per_second")
+
+    def __init__(self, window: float = 60.0):
+        self.histograms = {name: RollingHistogram(window) for name in self.NAMES}
+
+    def observe(self, name: str, value: Optional[float]):
+        if value is not None:
+            self.histograms[name].add(value)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        return {name: histogram.summary(now) for name, histogram in self.histograms.items()}
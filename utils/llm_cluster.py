@@ -1,13 +1,31 @@
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 import requests
+import httpx
 import time
-import socket
+import asyncio
+import ipaddress
 import psutil
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import threading
 import json
+import math
+import random
+import hashlib
+import bisect
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .response_cache import ResponseCache, canonical_request_key, is_deterministic
+from .single_flight import SingleFlight, StreamFanout, StreamRelay
+from .circuit_breaker import CircuitBreaker
+from .cluster_state import ClusterState, RedisClusterState
+from .cluster_metrics import ClusterMetrics
+from .instance_registry import InstanceRegistry, InstanceSpec
+from .latency_histogram import RequestMetrics, RollingHistogram
+from .token_estimator import TokenEstimator
+from .fair_queue import PRIORITY_CLASSES, FairQueue, priority_class
 
 @dataclass
 class LMStudioInstance:
@@ -20,163 +38,1900 @@ class LMStudioInstance:
     total_requests: int
     failed_requests: int
     avg_response_time: float
+    health_check_interval: float = 10.0  # Seconds, adapted per node
+    next_health_check: float = 0.0  # time.monotonic() deadline
+    weight: float = 1.0
+    in_flight: int = 0  # Requests dispatched by this gateway and not yet finished
+    remote_in_flight: int = 0  # Requests other gateways report in flight, when state is shared
+    outstanding_tokens: int = 0  # Predicted prompt + completion tokens of this gateway's in-flight requests
+    avg_request_tokens: float = 0.0  # EWMA of predicted tokens per request dispatched here
+    ewma_latency: float = 0.0  # Peak-EWMA of request latency in seconds
+    ewma_updated: float = 0.0  # time.monotonic() of the last EWMA sample
+    window_p50_latency: float = 0.0  # Median latency over the metrics window
+    window_error_rate: float = 0.0  # Failure rate over the circuit breaker window
+    models: List[str] = field(default_factory=list)  # Model ids reported by /v1/models
+    max_concurrency: Optional[int] = None  # Overrides the cluster-wide per-node limit
+
+    @property
+    def key(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def outstanding(self) -> int:
+        """In-flight requests across every gateway"""
+        return self.in_flight + self.remote_in_flight
+
+    def pending_work(self, tokens: int = 0) -> float:
+        """Queued work including a new request of `tokens`, in units of this node's typical request.
+
+        Falls back to counting requests until token estimates are available.
+        Requests from other gateways count as typical requests.
+        """
+        if not tokens or not self.avg_request_tokens:
+            return self.outstanding + 1
+        return (self.outstanding_tokens + tokens) / self.avg_request_tokens + self.remote_in_flight
+
+    def observe_latency(self, latency: float, decay: float = 10.0, now: Optional[float] = None):
+        """Fold a latency sample into the peak-EWMA.
+
+        Spikes are adopted immediately; improvements decay in with time constant
+        `decay` seconds, so a node that just got slow is avoided at once.
+        """
+        now = time.monotonic() if now is None else now
+        if not self.ewma_updated or latency > self.ewma_latency:
+            self.ewma_latency = latency
+        else:
+            w = math.exp(-(now - self.ewma_updated) / decay)
+            self.ewma_latency = self.ewma_latency * w + latency * (1 - w)
+        self.ewma_updated = now
+
+class RoutingStrategy:
+    """Base class for instance selection strategies.
+
+    `select` is always called with the cluster lock held and a non-empty list
+    of healthy candidates.
+    """
+    name = "base"
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        """Pick an instance for a request predicted to cost `tokens` (0 if unknown)"""
+        raise NotImplementedError
+
+class LeastOutstandingRequests(RoutingStrategy):
+    """Pick the node with the fewest in-flight requests per unit of weight"""
+    name = "least_outstanding"
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        return min(candidates, key=lambda x: (x.outstanding / x.weight, random.random()))
+
+class PeakEWMA(RoutingStrategy):
+    """Pick the node with the lowest expected latency given its current queue"""
+    name = "peak_ewma"
+
+    def __init__(self, default_latency: float = 1.0, failure_penalty: float = 5.0):
+        self.default_latency = default_latency  # Assumed for nodes with no samples yet
+        self.failure_penalty = failure_penalty
+
+    def cost(self, instance: LMStudioInstance, tokens: int = 0) -> float:
+        latency = instance.ewma_latency or instance.window_p50_latency or self.default_latency
+        return (
+            latency * instance.pending_work(tokens) / instance.weight *
+            (1 + self.failure_penalty * instance.window_error_rate)
+        )
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        return min(candidates, key=lambda x: (self.cost(x, tokens), random.random()))
+
+class PowerOfTwoChoices(PeakEWMA):
+    """Sample two nodes at random and take the cheaper by peak-EWMA cost"""
+    name = "p2c"
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        if len(candidates) == 1:
+            return candidates[0]
+        a, b = random.sample(candidates, 2)
+        return a if self.cost(a, tokens) <= self.cost(b, tokens) else b
+
+class LeastOutstandingWork(PeakEWMA):
+    """Pick the node that should clear its predicted tokens in flight soonest.
+
+    A node's work is the tokens it has in flight plus the new request's,
+    times its per-token latency. That latency was measured under the same
+    load the token count already includes, so it is damped by
+    `latency_exponent`; used linearly it overreacts to a node that just ran
+    a long request. Without a token estimate it falls back to peak-EWMA cost.
+    """
+    name = "least_work"
+
+    def __init__(self, default_latency: float = 1.0, failure_penalty: float = 5.0,
+                 latency_exponent: float = 0.25):
+        super().__init__(default_latency, failure_penalty)
+        self.latency_exponent = latency_exponent
+
+    @staticmethod
+    def token_latency(instance: LMStudioInstance) -> Optional[float]:
+        """Seconds per token of a typical request here, if known"""
+        latency = instance.ewma_latency or instance.window_p50_latency
+        if not latency or not instance.avg_request_tokens:
+            return None
+        return latency / instance.avg_request_tokens
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        if not tokens:
+            return super().select(candidates, tokens)
+        known = [latency for latency in map(self.token_latency, candidates) if latency]
+        # Unmeasured nodes are assumed as fast as the fastest, so they get tried
+        fallback = min(known, default=1.0)
+
+        def cost(x: LMStudioInstance) -> float:
+            work = x.outstanding_tokens + tokens + x.remote_in_flight * x.avg_request_tokens
+            latency = self.token_latency(x) or fallback
+            return (
+                work * latency ** self.latency_exponent / x.weight *
+                (1 + self.failure_penalty * x.window_error_rate)
+            )
+
+        return min(candidates, key=lambda x: (cost(x), x.outstanding / x.weight, random.random()))
+
+class WeightedRoundRobin(RoutingStrategy):
+    """Smooth weighted round robin, as in nginx's upstream module"""
+    name = "weighted_round_robin"
+
+    def __init__(self):
+        self.current_weights: Dict[str, float] = {}
+
+    def select(self, candidates: List[LMStudioInstance], tokens: int = 0) -> LMStudioInstance:
+        total = 0.0
+        best = None
+        for instance in candidates:
+            current = self.current_weights.get(instance.key, 0.0) + instance.weight
+            self.current_weights[instance.key] = current
+            total += instance.weight
+            if best is None or current > self.current_weights[best.key]:
+                best = instance
+        self.current_weights[best.key] -= total
+        return best
+
+ROUTING_STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (
+        PowerOfTwoChoices, LeastOutstandingRequests, LeastOutstandingWork, PeakEWMA, WeightedRoundRobin
+    )
+}
+
+class SSETokenCounter:
+    """Incrementally count generated tokens in an OpenAI-style SSE stream"""
+
+    def __init__(self):
+        self._buffer = b""
+        self.tokens = 0
+        self.reported_tokens: Optional[int] = None  # From a trailing usage block, if sent
+        self.prompt_tokens: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> int:
+        """Consume a raw chunk and return how many tokens it completed"""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        new_tokens = 0
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if not data or data == b"[DONE]":
+                continue
+            try:
+                event = json.loads(data)
+            except ValueError:
+                continue
+            # LM Studio emits one token per delta
+            for choice in event.get("choices") or []:
+                if (choice.get("delta") or {}).get("content"):
+                    new_tokens += 1
+            usage = event.get("usage")
+            if usage and usage.get("completion_tokens") is not None:
+                self.reported_tokens = usage["completion_tokens"]
+            if usage and usage.get("prompt_tokens") is not None:
+                self.prompt_tokens = usage["prompt_tokens"]
+        self.tokens += new_tokens
+        return new_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.reported_tokens if self.reported_tokens is not None else self.tokens
+
+def prefix_affinity_key(messages: List[Dict[str, Any]], leading_messages: int = 1) -> Optional[str]:
+    """Hash the leading system prompt and the first `leading_messages` conversation turns.
+
+    Multi-turn conversations resend the same opening messages every round, so
+    the key stays stable for a conversation while its history grows.
+    """
+    if not messages:
+        return None
+    prefix = []
+    turns = 0
+    for message in messages:
+        if message.get("role") != "system":
+            if turns == leading_messages:
+                break
+            turns += 1
+        prefix.append(message)
+    payload = json.dumps(prefix, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def is_continuation(messages: List[Dict[str, Any]], leading_messages: int = 1) -> bool:
+    """Whether the request carries history past the prefix that prefix_affinity_key hashes"""
+    turns = 0
+    for message in messages:
+        if message.get("role") != "system":
+            if turns == leading_messages:
+                return True
+            turns += 1
+    return False
+
+class PrefixAffinity:
+    """Consistent-hash affinity from conversation prefixes to instances.
+
+    Only conversations with history are routed here; first turns go to the
+    routing strategy and are remembered, so the next turn follows them while
+    that node has room. Otherwise each key maps to a position on a ring with
+    `replicas` virtual nodes per unit of weight, and the owner is the first
+    eligible node clockwise from it. A node that already carries more than
+    `load_factor` times its weighted share of in-flight requests is skipped
+    for its ring successor (consistent hashing with bounded loads), so a hot
+    conversation cannot pin an overloaded node.
+    """
+
+    def __init__(self, replicas: int = 64, load_factor: float = 1.25, table_size: int = 10000):
+        self.replicas = replicas
+        self.load_factor = load_factor
+        self.table_size = table_size
+        self._ring: List[Tuple[int, str]] = []
+        self._members: Dict[str, float] = {}  # Instance key -> weight
+        self._last_routed: "OrderedDict[str, str]" = OrderedDict()  # Affinity key -> instance key
+        self.hits = 0  # Routed to the node that served the prefix last time
+        self.misses = 0  # Seen before but routed elsewhere
+        self.new = 0  # First time this prefix was seen
+        self.spills = 0  # Owner was overloaded and the successor took the request
+        self._ttft = {"hit": [0.0, 0], "cold": [0.0, 0]}  # Sum and count per outcome
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def update_members(self, weights: Dict[str, float]):
+        """Rebuild the ring if the instances or their weights changed"""
+        weights = dict(weights)
+        if weights == self._members:
+            return
+        self._members = weights
+        self._ring = sorted(
+            (self._hash(f"{key}#{replica}"), key)
+            for key, weight in weights.items()
+            for replica in range(max(1, round(self.replicas * weight)))
+        )
+
+    def select(self, affinity_key: str, candidates: List[LMStudioInstance],
+               continuation: bool = True) -> Optional[LMStudioInstance]:
+        """Pick the instance for a prefix; call with the cluster lock held.
+
+        Returns None if the routing strategy should decide: the prefix is
+        new and the request has no history, or no candidate is on the ring.
+        """
+        last = self._last_routed.get(affinity_key)
+        if not self._ring or (last is None and not continuation):
+            return None
+        total_weight = sum(instance.weight for instance in candidates)
+        total_in_flight = sum(instance.outstanding for instance in candidates)
+
+        def has_room(instance: LMStudioInstance) -> bool:
+            share = instance.weight / total_weight
+            return instance.outstanding + 1 <= math.ceil(self.load_factor * (total_in_flight + 1) * share)
+
+        by_key = {instance.key: instance for instance in candidates}
+        if last in by_key and has_room(by_key[last]):
+            return by_key[last]
+
+        owner = chosen = None
+        seen: Set[str] = set()
+        start = bisect.bisect(self._ring, (self._hash(affinity_key), ""))
+        for offset in range(len(self._ring)):
+            node_key = self._ring[(start + offset) % len(self._ring)][1]
+            if node_key in seen:
+                continue
+            seen.add(node_key)
+            instance = by_key.get(node_key)
+            if instance is None:
+                continue
+            if owner is None:
+                owner = instance
+            if has_room(instance):
+                chosen = instance
+                break
+        if owner is None:
+            return None
+        if chosen is None:
+            chosen = owner
+        if chosen is not owner:
+            self.spills += 1
+        return chosen
+
+    def record(self, affinity_key: str, instance_key: str) -> str:
+        """Remember where a prefix went and classify the outcome; call with the cluster lock held"""
+        last = self._last_routed.pop(affinity_key, None)
+        if last is None:
+            outcome = "new"
+            self.new += 1
+        elif last == instance_key:
+            outcome = "hit"
+            self.hits += 1
+        else:
+            outcome = "miss"
+            self.misses += 1
+        self._last_routed[affinity_key] = instance_key
+        if len(self._last_routed) > self.table_size:
+            self._last_routed.popitem(last=False)
+        return outcome
+
+    def observe_ttft(self, outcome: str, ttft: float):
+        """Record time-to-first-token for a routed request; call with the cluster lock held"""
+        bucket = self._ttft["hit" if outcome == "hit" else "cold"]
+        bucket[0] += ttft
+        bucket[1] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        repeats = self.hits + self.misses
+        hit_ttft = self._ttft["hit"][0] / self._ttft["hit"][1] if self._ttft["hit"][1] else None
+        cold_ttft = self._ttft["cold"][0] / self._ttft["cold"][1] if self._ttft["cold"][1] else None
+        saved = None
+        if hit_ttft is not None and cold_ttft is not None:
+            saved = max(0.0, cold_ttft - hit_ttft) * self.hits
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "new": self.new,
+            "spills": self.spills,
+            "hit_rate": self.hits / repeats if repeats else 0.0,
+            "avg_ttft_hit": hit_ttft,
+            "avg_ttft_cold": cold_ttft,
+            "estimated_prompt_seconds_saved": saved,
+            "tracked_prefixes": len(self._last_routed)
+        }
+
+class ClusterSaturatedError(Exception):
+    """Every eligible instance is at its concurrency limit and the wait queue can't take the request"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class InstanceError(Exception):
+    """An instance failed a request in a way another instance might not (connection error or 5xx)"""
+
+class UpstreamRequestError(Exception):
+    """An instance rejected the request itself (4xx), as any other instance would"""
+
+    def __init__(self, message: str, status_code: int, detail: Any):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail  # The upstream error body, parsed if it was JSON
+
+class RetryBudget:
+    """Token bucket that caps retries and hedges at a fraction of recent traffic.
+
+    Every original request deposits `ratio` tokens and every retry spends one,
+    plus `min_per_second` tokens trickle in so low-traffic periods can still
+    retry. A failing cluster therefore sees at most (1 + ratio) times its
+    normal load instead of max_attempts times.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_balance: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float):
+        now = time.monotonic()
+        self.balance = min(
+            self.max_balance,
+            self.balance + amount + (now - self._updated) * self.min_per_second
+        )
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            self._refill(0.0)
+            if self.balance < 1.0:
+                return False
+            self.balance -= 1.0
+            return True
+
+@dataclass
+class RequestSize:
+    """Predicted size of a request, for token-aware routing and queueing"""
+    prompt_chars: int = 0
+    messages: int = 0
+    prompt_tokens: int = 0  # Predicted prompt tokens
+    tokens: int = 0  # Predicted prompt plus completion tokens
+
+@dataclass
+class Dispatch:
+    """A request routed to an instance, from acquire to release"""
+    instance: LMStudioInstance
+    start_time: float
+    model: Optional[str] = None  # As a metrics key, see _model_key
+    size: RequestSize = field(default_factory=RequestSize)
+    affinity_outcome: Optional[str] = None  # "hit", "miss" or "new" when affinity routed it
+    queue_wait: float = 0.0  # Seconds spent in the admission queue
+    ttft: Optional[float] = None  # Seconds to the first stream chunk, for streams
+
+@dataclass
+class Waiter:
+    """A request parked in the admission queue until an instance has a free slot"""
+    model: Optional[str]
+    affinity_key: Optional[str]
+    continuation: bool
+    priority_class: str
+    caller: str
+    exclude: Set[str]
+    size: RequestSize
+    enqueued_at: float
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
 
 class LLMClusterManager:
-    def __init__(self, network_range: str = "192.168.1.0/24", base_port: int = 1234):
+    def __init__(self, network_range: str = "192.168.1.0/24", base_port: int = 1234,
+                 max_connections_per_instance: int = 100, ports: Optional[List[int]] = None,
+                 scan_timeout: float = 1.0, scan_concurrency: int = 512,
+                 health_check_interval: float = 10.0, min_health_check_interval: float = 2.0,
+                 max_health_check_interval: float = 60.0, health_check_workers: int = 32,
+                 routing_strategy: str = "least_work", prefix_affinity: bool = True,
+                 affinity_leading_messages: int = 1, cache_size: int = 1024,
+                 cache_ttl: float = 3600, cache_dir: Optional[str] = None,
+                 coalesce_requests: bool = True, coalesce_nondeterministic: bool = False,
+                 max_concurrency_per_instance: int = 4, max_queue_size: int = 256,
+                 queue_timeout: float = 60.0, max_attempts: int = 3, retry_budget_ratio: float = 0.2,
+                 hedge_requests: bool = False, hedge_quantile: float = 0.95,
+                 hedge_min_delay: float = 0.5, breaker_settings: Optional[Dict[str, Any]] = None,
+                 metrics_window: float = 60.0, registry_path: Optional[str] = None,
+                 network_discovery: Optional[bool] = None,
+                 shared_state: Optional[Union[str, ClusterState]] = None,
+                 queue_seconds_per_token: float = 0.001, fair_share_quantum: int = 2048):
         self.instances: Dict[str, LMStudioInstance] = {}
+        self.model_index: Dict[str, Set[str]] = {}  # Model id -> instance keys serving it
         self.network_range = network_range
         self.base_port = base_port
+        self.ports = ports or [base_port]
+        self.scan_timeout = scan_timeout
+        self.scan_concurrency = scan_concurrency
+        self.health_check_interval = health_check_interval
+        self.min_health_check_interval = min_health_check_interval
+        self.max_health_check_interval = max_health_check_interval
+        if routing_strategy not in ROUTING_STRATEGIES:
+            raise ValueError(
+                f"Unknown routing strategy {routing_strategy!r}, "
+                f"expected one of {sorted(ROUTING_STRATEGIES)}"
+            )
+        self.router: RoutingStrategy = ROUTING_STRATEGIES[routing_strategy]()
+        self.prefix_affinity = prefix_affinity
+        self.affinity_leading_messages = affinity_leading_messages
+        self.affinity = PrefixAffinity()
+        self.response_cache = ResponseCache(cache_size, cache_ttl, cache_dir) if cache_size > 0 else None
+        self.coalesce_requests = coalesce_requests
+        self.coalesce_nondeterministic = coalesce_nondeterministic
+        self._flight = SingleFlight()
+        self._live_streams: Dict[str, StreamFanout] = {}
+        self.live_stream_joins = 0
+
+        # Admission control: per-node concurrency limits and a bounded wait queue with
+        # priority classes, fair sharing between callers, and short requests first
+        self.max_concurrency_per_instance = max_concurrency_per_instance
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self._waiters = FairQueue(quantum=fair_share_quantum)
+        self.queue_seconds_per_token = queue_seconds_per_token
+        self.token_estimator = TokenEstimator()
+        self.admission_stats = {
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "classes": {
+                name: {"admitted_after_wait": 0, "total_wait": 0.0, "max_wait": 0.0}
+                for name in PRIORITY_CLASSES
+            }
+        }
+
+        # Failover and hedging
+        self.max_attempts = max_attempts
+        self.retry_budget = RetryBudget(ratio=retry_budget_ratio)
+        self.hedge_requests = hedge_requests
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+
+        # Rolling distributions per instance, per model, and cluster-wide for hedging
+        self.metrics_window = metrics_window
+        self.instance_metrics: Dict[str, RequestMetrics] = {}
+        self.model_metrics: Dict[str, RequestMetrics] = {}
+        self.cluster_ttft = RollingHistogram(metrics_window)  # Seconds to first stream chunk
+        self.cluster_latency = RollingHistogram(metrics_window)  # Seconds for full non-streamed responses
+        # Circuit breakers, one per instance key, created on first use
+        self.breaker_settings = breaker_settings or {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.breaker_transitions: deque = deque(maxlen=50)
+
+        self.failover_stats = {
+            "retries": 0,
+            "retries_denied": 0,
+            "hedges": 0,
+            "hedge_wins": 0
+        }
+        self._health_executor = ThreadPoolExecutor(
+            max_workers=health_check_workers, thread_name_prefix="health-check"
+        )
+        self.max_connections_per_instance = max_connections_per_instance
         self.lock = threading.Lock()
         self.logger = logging.getLogger("LLMCluster")
-        
-        # Start background tasks
-        self.discovery_thread = threading.Thread(target=self._discover_instances, daemon=True)
-        self.health_check_thread = threading.Thread(target=self._health_check_loop, daemon=True)
-        self.discovery_thread.start()
+        self.metrics = ClusterMetrics()  # Prometheus collectors, updated as events happen
+
+        # Pooled async clients, one per instance, created lazily on the event loop
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+
+        # Declared instances are registered up front; scanning is only the default without them
+        self.registry = InstanceRegistry(registry_path, default_port=base_port)
+        self._registry_keys: Set[str] = set()
+        self.network_discovery = (
+            not self.registry.configured if network_discovery is None else network_discovery
+        )
+        self._reload_registry()
+
+        # Shared view of health and load across gateways; a Redis URL or a ClusterState
+        if isinstance(shared_state, str):
+            shared_state = RedisClusterState(shared_state)
+        self.shared_state: Optional[ClusterState] = shared_state
+        self._shared_keys: Set[str] = set()
+        self.is_leader = True
+
+        # Background threads are started by start() and stopped by stop()
+        self._stop = threading.Event()
+        self.discovery_thread: Optional[threading.Thread] = None
+        self.health_check_thread: Optional[threading.Thread] = None
+
+    def start(self, warm_up_timeout: float = 0.5):
+        """Warm up and start the discovery and health check threads.
+
+        Known instances (from the registry) are probed once in parallel with a
+        short timeout first, so their health and models are current before
+        the first request is routed.
+        """
+        if self.health_check_thread is not None:
+            return
+        self._stop.clear()
+        self._sync_leadership()
+        if self.is_leader:
+            self._warm_up(warm_up_timeout)
+        else:
+            self._sync_shared_state()
+        if self.network_discovery:
+            self.discovery_thread = threading.Thread(
+                target=self._discover_instances, name="cluster-discovery", daemon=True
+            )
+            self.discovery_thread.start()
+        self.health_check_thread = threading.Thread(
+            target=self._health_check_loop, name="cluster-health", daemon=True
+        )
         self.health_check_thread.start()
 
+    def stop(self, timeout: float = 5.0):
+        """Stop the background threads and leave the shared cluster state"""
+        self._stop.set()
+        for thread in (self.discovery_thread, self.health_check_thread):
+            if thread is not None:
+                thread.join(timeout)
+        self.discovery_thread = self.health_check_thread = None
+        if self.shared_state is not None:
+            self.shared_state.close()
+
+    def _warm_up(self, timeout: float):
+        """Probe every known instance once, in parallel"""
+        with self.lock:
+            targets = [(key, instance.host, instance.port) for key, instance in self.instances.items()]
+        if not targets:
+            return
+        started = time.monotonic()
+        results = self._health_executor.map(
+            lambda target: self._probe_instance(*target, timeout=timeout), targets
+        )
+        results = dict(zip((key for key, _, _ in targets), results))
+        self._apply_health_results(results)
+        healthy = sum(1 for result in results.values() if result["healthy"])
+        self.logger.info(
+            f"Warm-up probed {len(targets)} instances in "
+            f"{time.monotonic() - started:.3f}s, {healthy} healthy"
+        )
+
+    def _reload_registry(self):
+        """Apply the instance registry if it changed since the last check"""
+        specs = self.registry.poll()
+        if specs is not None:
+            self._apply_registry(specs)
+
+    def _apply_registry(self, specs: List[InstanceSpec]):
+        """Make the declared instances match `specs`.
+
+        New nodes are routable immediately and probed on the next health check
+        tick. Weights, concurrency limits and declared models are updated in
+        place, and nodes dropped from the registry leave rotation. Instances
+        found by scanning are left alone.
+        """
+        now = time.monotonic()
+        with self.lock:
+            added, removed = [], []
+            for spec in specs:
+                instance = self.instances.get(spec.key)
+                if instance is None:
+                    instance = LMStudioInstance(
+                        host=spec.host,
+                        port=spec.port,
+                        last_health_check=datetime.now(),
+                        is_healthy=True,
+                        current_load=0.0,
+                        queue_length=0,
+                        total_requests=0,
+                        failed_requests=0,
+                        avg_response_time=0.0,
+                        health_check_interval=self.min_health_check_interval,
+                        next_health_check=now
+                    )
+                    self.instances[spec.key] = instance
+                    added.append(spec.key)
+                instance.weight = spec.weight
+                instance.max_concurrency = spec.max_concurrency
+                if spec.models is not None:
+                    instance.models = list(spec.models)
+
+            declared = {spec.key for spec in specs}
+            for key in self._registry_keys - declared:
+                if self.instances.pop(key, None) is not None:
+                    removed.append(key)
+            self._registry_keys = declared
+            self._rebuild_indexes()
+            self._dispatch_waiters()
+
+        for key in added:
+            self.metrics.instance_up.labels(key).set(1)
+        for key in removed:
+            self.metrics.instance_up.labels(key).set(0)
+        self.logger.info(
+            f"Instance registry loaded: {len(specs)} declared, "
+            f"{len(added)} added, {len(removed)} removed"
+        )
+
     def _discover_instances(self):
-        """Continuously discover LMStudio instances on the network"""
-        while True:
+        """Continuously discover LMStudio instances on the network.
+
+        With shared state only the leader scans; the others learn about new
+        instances from its health table.
+        """
+        while not self._stop.is_set():
+            if not self.is_leader:
+                self._stop.wait(5)
+                continue
+            started = time.monotonic()
             try:
                 # Scan network for LMStudio instances
-                for host in self._scan_network():
-                    if host not in self.instances:
-                        if self._check_lmstudio_available(host):
+                for host, port in self._scan_network():
+                    key = f"{host}:{port}"
+                    if key not in self.instances:
+                        models = self._fetch_models(host, port)
+                        if models is not None:
                             with self.lock:
-                                self.instances[host] = LMStudioInstance(
+                                self.instances[key] = LMStudioInstance(
                                     host=host,
-                                    port=self.base_port,
+                                    port=port,
                                     last_health_check=datetime.now(),
                                     is_healthy=True,
                                     current_load=0.0,
                                     queue_length=0,
                                     total_requests=0,
                                     failed_requests=0,
-                                    avg_response_time=0.0
+                                    avg_response_time=0.0,
+                                    health_check_interval=self.health_check_interval,
+                                    next_health_check=time.monotonic() + self.health_check_interval,
+                                    models=models
                                 )
-                            self.logger.info(f"Discovered new LMStudio instance at {host}")
+                                self._rebuild_indexes()
+                            self.metrics.instance_up.labels(key).set(1)
+                            self.logger.info(f"Discovered new LMStudio instance at {key}")
             except Exception as e:
                 self.logger.error(f"Error in instance discovery: {str(e)}")
-            time.sleep(60)  # Check every minute
+            self.metrics.discovery_duration.observe(time.monotonic() - started)
+            self._stop.wait(60)  # Check every minute
 
-    def _scan_network(self) -> List[str]:
-        """Scan the network for potential LMStudio hosts"""
-        active_hosts = []
+    def _scan_network(self) -> List[Tuple[str, int]]:
+        """Scan the configured network range for hosts with an open LMStudio port"""
         try:
-            # Basic network scan - can be enhanced with nmap or similar
-            for i in range(1, 255):
-                host = f"192.168.1.{i}"
-                try:
-                    socket.create_connection((host, self.base_port), timeout=1)
-                    active_hosts.append(host)
-                except (socket.timeout, ConnectionRefusedError):
-                    continue
+            network = ipaddress.ip_network(self.network_range, strict=False)
+        except ValueError as e:
+            self.logger.error(f"Invalid network range {self.network_range}: {str(e)}")
+            return []
+
+        targets = [(str(host), port) for host in network.hosts() for port in self.ports]
+        start_time = time.time()
+        try:
+            active_hosts = asyncio.run(self._probe_targets(targets))
         except Exception as e:
             self.logger.error(f"Network scan error: {str(e)}")
+            return []
+        self.logger.debug(
+            f"Scanned {len(targets)} targets in {time.time() - start_time:.2f}s, "
+            f"{len(active_hosts)} open"
+        )
         return active_hosts
 
-    def _check_lmstudio_available(self, host: str) -> bool:
-        """Check if LMStudio is running on the host"""
+    async def _probe_targets(self, targets: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Probe (host, port) pairs concurrently and return the ones accepting connections"""
+        semaphore = asyncio.Semaphore(self.scan_concurrency)
+
+        async def probe(host: str, port: int) -> Optional[Tuple[str, int]]:
+            async with semaphore:
+                try:
+                    _, writer = await asyncio.wait_for(
+                        asyncio.open_connection(host, port), timeout=self.scan_timeout
+                    )
+                except (OSError, asyncio.TimeoutError):
+                    return None
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+                return host, port
+
+        results = await asyncio.gather(*(probe(host, port) for host, port in targets))
+        return [result for result in results if result]
+
+    def _fetch_models(self, host: str, port: Optional[int] = None,
+                      timeout: float = 2.0) -> Optional[List[str]]:
+        """Return the model ids served by the host, or None if LMStudio isn't reachable"""
         try:
             response = requests.get(
-                f"http://{host}:{self.base_port}/v1/models",
-                timeout=2
+                f"http://{host}:{port or self.base_port}/v1/models",
+                timeout=timeout
             )
-            return response.status_code == 200
+            if response.status_code != 200:
+                return None
+            try:
+                return [model["id"] for model in response.json().get("data", [])]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return []
         except:
-            return False
+            return None
+
+    def _check_lmstudio_available(self, host: str, port: Optional[int] = None) -> bool:
+        """Check if LMStudio is running on the host"""
+        return self._fetch_models(host, port) is not None
+
+    def _rebuild_indexes(self):
+        """Recompute the model index and affinity ring; call with the lock held"""
+        index: Dict[str, Set[str]] = {}
+        for key, instance in self.instances.items():
+            for model in instance.models:
+                index.setdefault(model, set()).add(key)
+        self.model_index = index
+        self.affinity.update_members({key: i.weight for key, i in self.instances.items()})
 
     def _health_check_loop(self):
-        """Continuously monitor health of instances"""
-        while True:
+        """Continuously monitor health of instances.
+
+        Due instances are probed in parallel without holding the lock, and the
+        results are swapped in together afterwards, so routing never waits on a
+        health check.
+        """
+        while not self._stop.is_set():
+            self._sync_leadership()
+            now = time.monotonic()
             with self.lock:
-                for host, instance in list(self.instances.items()):
-                    try:
-                        # Check basic connectivity
-                        is_healthy = self._check_lmstudio_available(host)
-                        
-                        # Get system metrics if available
-                        try:
-                            metrics_response = requests.get(
-                                f"http://{host}:{self.base_port}/metrics",
-                                timeout=2
-                            )
-                            metrics = metrics_response.json()
-                            instance.current_load = metrics.get('cpu_usage', 0)
-                            instance.queue_length = metrics.get('queue_length', 0)
-                        except:
-                            # Metrics endpoint might not exist, ignore
-                            pass
-
-                        instance.is_healthy = is_healthy
-                        instance.last_health_check = datetime.now()
-
-                        if not is_healthy:
-                            self.logger.warning(f"Instance {host} is unhealthy")
-                    except Exception as e:
-                        self.logger.error(f"Health check failed for {host}: {str(e)}")
-                        instance.is_healthy = False
+                due = [
+                    (key, instance.host, instance.port)
+                    for key, instance in self.instances.items()
+                    if instance.next_health_check <= now
+                ] if self.is_leader else []
+
+            if due:
+                results = self._health_executor.map(lambda target: self._probe_instance(*target), due)
+                self._apply_health_results(dict(zip((key for key, _, _ in due), results)))
+
+            self._reload_registry()
+            self._sync_shared_state()
+            self._refresh_window_stats()
+            self._stop.wait(1)
+
+    def _sync_leadership(self):
+        """Take or renew the leader lease. Without shared state every gateway leads.
+
+        If the shared store is unreachable the gateway falls back to probing
+        on its own rather than leaving the cluster unmonitored.
+        """
+        if self.shared_state is None:
+            return
+        try:
+            is_leader = self.shared_state.try_lead()
+        except Exception as e:
+            self.logger.error(f"Could not reach shared cluster state: {str(e)}")
+            is_leader = True
+        if is_leader != self.is_leader:
+            self.logger.info(
+                f"Gateway {self.shared_state.gateway_id} "
+                f"{'is now the leader' if is_leader else 'is following the leader'}"
+            )
+        self.is_leader = is_leader
+
+    def _sync_shared_state(self):
+        """Exchange health and in-flight counts with the other gateways"""
+        if self.shared_state is None:
+            return
+        try:
+            if self.is_leader:
+                with self.lock:
+                    table = {
+                        key: {
+                            "host": instance.host,
+                            "port": instance.port,
+                            "healthy": instance.is_healthy,
+                            "load": instance.current_load,
+                            "queue_length": instance.queue_length,
+                            "models": list(instance.models),
+                            "weight": instance.weight,
+                            "max_concurrency": instance.max_concurrency,
+                            "last_check": instance.last_health_check.isoformat()
+                        }
+                        for key, instance in self.instances.items()
+                    }
+                self.shared_state.publish_health(table)
+            else:
+                table = self.shared_state.read_health()
+                if table is not None:
+                    self._apply_shared_health(table)
 
-            time.sleep(10)  # Check every 10 seconds
+            with self.lock:
+                in_flight = {key: i.in_flight for key, i in self.instances.items() if i.in_flight}
+            self.shared_state.publish_load(in_flight)
+            remote = self.shared_state.read_remote_load()
+            with self.lock:
+                for key, instance in self.instances.items():
+                    instance.remote_in_flight = remote.get(key, 0)
+                self._dispatch_waiters()
+        except Exception as e:
+            self.logger.error(f"Shared cluster state sync failed: {str(e)}")
+
+    def _apply_shared_health(self, table: Dict[str, Dict[str, Any]]):
+        """Adopt the leader's instance table on a follower"""
+        with self.lock:
+            changed = False
+            for key, data in table.items():
+                instance = self.instances.get(key)
+                if instance is None:
+                    instance = LMStudioInstance(
+                        host=data["host"],
+                        port=data["port"],
+                        last_health_check=datetime.now(),
+                        is_healthy=data["healthy"],
+                        current_load=0.0,
+                        queue_length=0,
+                        total_requests=0,
+                        failed_requests=0,
+                        avg_response_time=0.0,
+                        weight=data["weight"],
+                        max_concurrency=data["max_concurrency"]
+                    )
+                    self.instances[key] = instance
+                    changed = True
+                if instance.is_healthy != data["healthy"] or instance.models != data["models"]:
+                    changed = True
+                instance.is_healthy = data["healthy"]
+                instance.current_load = data["load"]
+                instance.queue_length = data["queue_length"]
+                instance.models = data["models"]
+                instance.last_health_check = datetime.fromisoformat(data["last_check"])
+                # Probed by the leader; only probe if this gateway takes over
+                instance.next_health_check = time.monotonic() + instance.health_check_interval
+
+            for key in self._shared_keys - set(table) - self._registry_keys:
+                self.instances.pop(key, None)
+                changed = True
+            self._shared_keys = set(table)
+            if changed:
+                self._rebuild_indexes()
+                self._dispatch_waiters()
+
+    def _refresh_window_stats(self):
+        """Copy windowed latency and error rates onto instances for the router"""
+        summaries = {
+            key: metrics.histograms["latency"].snapshot().quantile(0.5)
+            for key, metrics in list(self.instance_metrics.items())
+        }
+        with self.lock:
+            for key, instance in self.instances.items():
+                instance.window_p50_latency = summaries.get(key) or 0.0
+                instance.window_error_rate = self._breaker(instance).status()["window_error_rate"]
+
+    def _probe_instance(self, key: str, host: str, port: int, timeout: float = 2.0) -> Dict[str, Any]:
+        """Probe one instance; never raises"""
+        result: Dict[str, Any] = {"healthy": False}
+        started = time.monotonic()
+        try:
+            # Check basic connectivity and refresh the model inventory
+            models = self._fetch_models(host, port, timeout)
+            result["healthy"] = models is not None
+            if models is not None:
+                result["models"] = models
+
+            # Get system metrics if available
+            try:
+                metrics_response = requests.get(f"http://{host}:{port}/metrics", timeout=timeout)
+                metrics = metrics_response.json()
+                result["load"] = metrics.get('cpu_usage', 0)
+                result["queue_length"] = metrics.get('queue_length', 0)
+            except:
+                # Metrics endpoint might not exist, ignore
+                pass
+        except Exception as e:
+            self.logger.error(f"Health check failed for {key}: {str(e)}")
+        self.metrics.health_check_duration.observe(time.monotonic() - started)
+        return result
+
+    def _apply_health_results(self, results: Dict[str, Dict[str, Any]]):
+        """Swap probe results into the instance table and reschedule each node.
+
+        A node whose health flipped is re-probed at the minimum interval; a node
+        whose state held backs off towards the maximum interval.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for key, result in results.items():
+                instance = self.instances.get(key)
+                if instance is None:
+                    continue
 
-    def get_best_instance(self) -> Optional[LMStudioInstance]:
+                is_healthy = result["healthy"]
+                if is_healthy != instance.is_healthy:
+                    instance.health_check_interval = self.min_health_check_interval
+                else:
+                    instance.health_check_interval = min(
+                        instance.health_check_interval * 1.5, self.max_health_check_interval
+                    )
+
+                instance.is_healthy = is_healthy
+                instance.current_load = result.get("load", instance.current_load)
+                instance.queue_length = result.get("queue_length", instance.queue_length)
+                instance.models = result.get("models", instance.models)
+                instance.last_health_check = datetime.now()
+                instance.next_health_check = now + instance.health_check_interval
+                self.metrics.instance_up.labels(key).set(1 if is_healthy else 0)
+
+                if not is_healthy:
+                    self.logger.warning(f"Instance {key} is unhealthy")
+
+            self._rebuild_indexes()
+            self._dispatch_waiters()
+
+    def _breaker(self, instance: LMStudioInstance) -> CircuitBreaker:
+        """The instance's circuit breaker; call with the lock held"""
+        breaker = self.breakers.get(instance.key)
+        if breaker is None:
+            key = instance.key
+
+            def on_transition(previous: str, state: str, reason: str):
+                self.breaker_transitions.append({
+                    "instance": key,
+                    "time": datetime.now().isoformat(),
+                    "from": previous,
+                    "to": state,
+                    "reason": reason
+                })
+                self.metrics.circuit_state.labels(key).state(state)
+                log = self.logger.warning if state == CircuitBreaker.OPEN else self.logger.info
+                log(f"Circuit for {key} {previous} -> {state}: {reason}")
+
+            breaker = CircuitBreaker(on_transition=on_transition, **self.breaker_settings)
+            self.breakers[key] = breaker
+        return breaker
+
+    def _available_instances(self, model: Optional[str] = None) -> List[LMStudioInstance]:
+        """Instances eligible for routing; call with the lock held.
+
+        When `model` is loaded somewhere in the cluster only the nodes serving it
+        are eligible. Models no node reports (aliases such as "local-model") may
+        go anywhere. Nodes whose circuit is open are skipped.
+        """
+        now = time.monotonic()
+        candidates = [
+            i for i in self.instances.values()
+            if i.is_healthy and i.current_load < 0.9  # Allow some headroom
+            and self._breaker(i).is_available(now)
+        ]
+        serving = self.model_index.get(model) if model else None
+        if serving:
+            candidates = [i for i in candidates if i.key in serving]
+        return candidates
+
+    def get_best_instance(self, model: Optional[str] = None) -> Optional[LMStudioInstance]:
         """Get the best instance to handle the next request"""
         with self.lock:
-            available_instances = [
-                i for i in self.instances.values()
-                if i.is_healthy and i.current_load < 0.9  # Allow some headroom
-            ]
-            
+            available_instances = self._available_instances(model)
             if not available_instances:
                 return None
+            return self.router.select(available_instances, 0)
 
-            # Sort by load and queue length
-            return min(
-                available_instances,
-                key=lambda x: (x.current_load * 0.7 + (x.queue_length / 10) * 0.3)
-            )
+    def _instance_capacity(self, instance: LMStudioInstance) -> int:
+        return instance.max_concurrency or self.max_concurrency_per_instance
+
+    def _affinity(self, request_data: Dict) -> Tuple[Optional[str], bool]:
+        """(prefix affinity key, whether the request continues a conversation)"""
+        if not self.prefix_affinity:
+            return None, False
+        messages = request_data.get("messages") or []
+        return (
+            prefix_affinity_key(messages, self.affinity_leading_messages),
+            is_continuation(messages, self.affinity_leading_messages)
+        )
+
+    def _model_key(self, model: Optional[str]) -> Optional[str]:
+        """The model name for metrics and estimates, "other" unless some instance serves it.
 
-    def execute_request(self, request_data: Dict) -> Dict:
-        """Execute a request on the best available instance"""
-        instance = self.get_best_instance()
-        if not instance:
+        Clients choose the model string, so keying on it unchecked would let
+        them grow memory and metric label sets without bound.
+        """
+        if not model or model in self.model_index:
+            return model
+        return "other"
+
+    def _request_size(self, request_data: Dict) -> RequestSize:
+        chars, prompt_tokens, completion_tokens = self.token_estimator.estimate(
+            request_data, self._model_key(request_data.get("model"))
+        )
+        return RequestSize(
+            prompt_chars=chars,
+            messages=len(request_data.get("messages") or []),
+            prompt_tokens=prompt_tokens,
+            tokens=prompt_tokens + completion_tokens
+        )
+
+    def _select_instance(self, model: Optional[str], affinity_key: Optional[str],
+                         exclude: Optional[Set[str]] = None,
+                         size: Optional[RequestSize] = None,
+                         continuation: bool = False) -> Optional[Dispatch]:
+        """Route to an instance with a free slot and claim it; call with the lock held.
+
+        Raises if no healthy instance outside `exclude` can serve the model at
+        all, and returns None if they are all at their concurrency limit.
+        """
+        available_instances = self._available_instances(model)
+        if exclude:
+            available_instances = [i for i in available_instances if i.key not in exclude]
+        if not available_instances:
+            if model:
+                raise Exception(f"No healthy instances available for model {model}")
             raise Exception("No healthy instances available")
 
-        start_time = time.time()
+        available_instances = [
+            i for i in available_instances if i.outstanding < self._instance_capacity(i)
+        ]
+        if not available_instances:
+            return None
+
+        instance = self.affinity.select(
+            affinity_key, available_instances, continuation
+        ) if affinity_key else None
+        if instance is None:
+            instance = self.router.select(available_instances, size.tokens if size else 0)
+        outcome = self.affinity.record(affinity_key, instance.key) if affinity_key else None
+        instance.in_flight += 1
+        if size and size.tokens:
+            instance.outstanding_tokens += size.tokens
+            instance.avg_request_tokens = (
+                0.9 * instance.avg_request_tokens + 0.1 * size.tokens
+                if instance.avg_request_tokens else float(size.tokens)
+            )
+            self.metrics.outstanding_tokens.labels(instance.key).inc(size.tokens)
+        self.metrics.in_flight.labels(instance.key).inc()
+        self._breaker(instance).on_dispatch()
+        return Dispatch(
+            instance=instance, start_time=time.time(), model=self._model_key(model),
+            size=size or RequestSize(), affinity_outcome=outcome
+        )
+
+    def _retry_after(self) -> float:
+        """Rough seconds until the queue drains; call with the lock held"""
+        healthy = [i for i in self.instances.values() if i.is_healthy]
+        capacity = sum(self._instance_capacity(i) for i in healthy) or 1
+        latency = self.cluster_latency.snapshot().quantile(0.5) or 1.0
+        return max(1.0, math.ceil((len(self._waiters) + 1) / capacity * latency))
+
+    async def _aacquire_instance(self, request_data: Dict, priority: str = "normal",
+                                 exclude: Optional[Set[str]] = None,
+                                 caller: Optional[str] = None) -> Dispatch:
+        """Select an instance, waiting in the admission queue while the cluster is saturated.
+
+        Queued requests are served by priority class (interactive, normal,
+        batch), and within a class by deficit round robin over callers
+        weighted by predicted tokens. A caller's own requests are ordered by
+        arrival time plus queue_seconds_per_token for each predicted token, so
+        short requests get ahead of long ones without starving them. New
+        arrivals never bypass the queue. Raises ClusterSaturatedError if the
+        queue is full or the wait exceeds queue_timeout.
+        """
+        priority = priority_class(priority)
+        model = request_data.get("model")
+        affinity_key, continuation = self._affinity(request_data)
+        size = self._request_size(request_data)
+        loop = asyncio.get_running_loop()
+        exclude = exclude or set()
+        with self.lock:
+            if not self._waiters:
+                dispatch = self._select_instance(model, affinity_key, exclude, size, continuation)
+                if dispatch is not None:
+                    self.metrics.queue_wait.labels(priority).observe(0)
+                    return dispatch
+            elif not [i for i in self._available_instances(model) if i.key not in exclude]:
+                raise Exception(f"No healthy instances available for model {model}")
+
+            if len(self._waiters) >= self.max_queue_size:
+                self.admission_stats["rejected_queue_full"] += 1
+                self.metrics.admission_rejections.labels("queue_full").inc()
+                raise ClusterSaturatedError("Admission queue is full", self._retry_after())
+
+            waiter = Waiter(
+                model=model, affinity_key=affinity_key, continuation=continuation,
+                priority_class=priority, caller=caller or "anonymous", exclude=exclude, size=size,
+                enqueued_at=time.time(), future=loop.create_future(), loop=loop
+            )
+            self._waiters.push(
+                waiter, priority, waiter.caller, size.tokens,
+                waiter.enqueued_at + size.tokens * self.queue_seconds_per_token
+            )
+            self._update_queue_depth()
+            self._dispatch_waiters()
+
         try:
-            response = requests.post(
-                f"http://{instance.host}:{instance.port}/v1/chat/completions",
-                json=request_data,
-                timeout=3600  # Long timeout for generation
+            dispatch = await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self.lock:
+                self._remove_waiter(waiter)
+                retry_after = self._retry_after()
+            if (waiter.future.done() and not waiter.future.cancelled()
+                    and waiter.future.exception() is None):
+                # Granted a slot while we were giving up; hand it back
+                self._release_instance(waiter.future.result(), None)
+            else:
+                waiter.future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            with self.lock:
+                self.admission_stats["rejected_timeout"] += 1
+                self.metrics.admission_rejections.labels("timeout").inc()
+            raise ClusterSaturatedError(
+                f"Timed out after {self.queue_timeout}s waiting for a free instance", retry_after
+            )
+
+        with self.lock:
+            stats = self.admission_stats["classes"][priority]
+            stats["admitted_after_wait"] += 1
+            stats["total_wait"] += dispatch.queue_wait
+            stats["max_wait"] = max(stats["max_wait"], dispatch.queue_wait)
+        self.metrics.queue_wait.labels(priority).observe(dispatch.queue_wait)
+        return dispatch
+
+    def _remove_waiter(self, waiter: Waiter):
+        """Drop a waiter from the queue if it is still there; call with the lock held"""
+        if self._waiters.remove(waiter):
+            self._update_queue_depth()
+
+    def _update_queue_depth(self):
+        for name in PRIORITY_CLASSES:
+            self.metrics.queue_depth.labels(name).set(self._waiters.depth(name))
+
+    def _dispatch_waiters(self):
+        """Hand free slots to queued requests in scheduling order; call with the lock held"""
+        if not self._waiters:
+            return
+
+        def offer(waiter: Waiter) -> Optional[bool]:
+            try:
+                dispatch = self._select_instance(
+                    waiter.model, waiter.affinity_key, waiter.exclude, waiter.size,
+                    waiter.continuation
+                )
+            except Exception as e:
+                # The model's instances all went away; fail the request instead of letting it time out
+                waiter.loop.call_soon_threadsafe(self._fail_waiter, waiter, e)
+                return True
+            if dispatch is None:
+                # Stop once no node has a free slot; otherwise only this model is full
+                if not any(i.outstanding < self._instance_capacity(i) for i in self.instances.values()):
+                    return None
+                return False
+            dispatch.queue_wait = dispatch.start_time - waiter.enqueued_at
+            waiter.loop.call_soon_threadsafe(self._grant_waiter, waiter, dispatch)
+            return True
+
+        if self._waiters.schedule(offer):
+            self._update_queue_depth()
+
+    def _grant_waiter(self, waiter: Waiter, dispatch: Dispatch):
+        if waiter.future.done():
+            # The waiter gave up in the meantime; free the slot for the next one
+            self._release_instance(dispatch, None)
+        else:
+            waiter.future.set_result(dispatch)
+
+    def _fail_waiter(self, waiter: Waiter, error: Exception):
+        if not waiter.future.done():
+            waiter.future.set_exception(error)
+
+    def _release_instance(self, dispatch: Dispatch, success: Optional[bool],
+                          tokens: Optional[int] = None, rejected: bool = False):
+        """Finish a request started with _aacquire_instance.
+
+        `success` is None when the caller went away before the outcome was known.
+        `rejected` marks a request the node refused with a 4xx: it says nothing
+        about the node's health or speed, so it only settles a breaker probe.
+        `tokens` is the prompt and completion tokens processed, which the
+        circuit breaker uses to judge slowness. The freed slot goes to the
+        next queued request, if any.
+        """
+        instance = dispatch.instance
+        latency = time.time() - dispatch.start_time
+        if rejected:
+            success = None
+            outcome = "rejected"
+        else:
+            outcome = "abandoned" if success is None else "success" if success else "failure"
+        self.metrics.in_flight.labels(instance.key).dec()
+        self.metrics.requests.labels(instance.key, dispatch.model or "", outcome).inc()
+        if dispatch.size.tokens:
+            self.metrics.outstanding_tokens.labels(instance.key).dec(dispatch.size.tokens)
+        with self.lock:
+            instance.in_flight -= 1
+            instance.outstanding_tokens -= dispatch.size.tokens
+            breaker = self._breaker(instance)
+            if success is None:
+                breaker.on_abandoned()
+            else:
+                breaker.record(success, dispatch.ttft, latency / tokens if tokens else None)
+            self._dispatch_waiters()
+            if success is None:
+                return
+            if not success:
+                instance.failed_requests += 1
+                return
+            instance.total_requests += 1
+            instance.avg_response_time = (
+                (instance.avg_response_time * (instance.total_requests - 1) +
+                latency) / instance.total_requests
+            )
+            if dispatch.size.tokens and instance.avg_request_tokens:
+                # Scale to a typical request so pending_work() and the EWMA agree on units
+                instance.observe_latency(latency * instance.avg_request_tokens / dispatch.size.tokens)
+            else:
+                instance.observe_latency(latency)
+
+        self._observe(dispatch, "latency", latency)
+        self._observe(dispatch, "queue_wait", dispatch.queue_wait)
+        self.metrics.request_duration.labels(dispatch.model or "").observe(latency)
+
+    @staticmethod
+    def _processed_tokens(dispatch: Dispatch, prompt_tokens: Optional[int],
+                          completion_tokens: Optional[int]) -> int:
+        """Tokens a request processed as reported, filling gaps from the prediction"""
+        if prompt_tokens is None and completion_tokens is None:
+            return dispatch.size.tokens
+        return (prompt_tokens or dispatch.size.prompt_tokens) + (completion_tokens or 0)
+
+    def _observe(self, dispatch: Dispatch, name: str, value: Optional[float]):
+        """Record a sample for the dispatch's instance and model"""
+        if value is None:
+            return
+        metrics = self.instance_metrics.get(dispatch.instance.key)
+        if metrics is None:
+            metrics = self.instance_metrics.setdefault(
+                dispatch.instance.key, RequestMetrics(self.metrics_window)
             )
-            
-            # Update metrics
+        metrics.observe(name, value)
+        if dispatch.model:
+            metrics = self.model_metrics.get(dispatch.model)
+            if metrics is None:
+                metrics = self.model_metrics.setdefault(
+                    dispatch.model, RequestMetrics(self.metrics_window)
+                )
+            metrics.observe(name, value)
+
+    def _cache_key(self, request_data: Dict) -> Optional[str]:
+        """Cache key for a request, or None if its response must not be cached"""
+        if not self.response_cache or request_data.get("stream") or not is_deterministic(request_data):
+            return None
+        return canonical_request_key(request_data)
+
+    async def _read_cache(self, cache_key: Optional[str], read_cache: bool) -> Optional[Dict]:
+        if not cache_key:
+            return None
+        if not read_cache:
+            self.response_cache.record_bypass()
+            self.metrics.cache_lookups.labels("bypass").inc()
+            return None
+        cached = await self.response_cache.aget(cache_key)
+        self.metrics.cache_lookups.labels("miss" if cached is None else "hit").inc()
+        return cached
+
+    def _write_cache(self, cache_key: Optional[str], write_cache: bool, result: Dict):
+        if cache_key and write_cache and isinstance(result, dict) and result.get("choices"):
+            self.response_cache.put(cache_key, result)
+
+    def _get_async_client(self, instance: LMStudioInstance) -> httpx.AsyncClient:
+        """Get the pooled async client for an instance, creating it on first use"""
+        client = self._async_clients.get(instance.key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=f"http://{instance.host}:{instance.port}",
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_instance,
+                    max_keepalive_connections=self.max_connections_per_instance
+                ),
+                timeout=httpx.Timeout(3600, connect=5)  # Long timeout for generation
+            )
+            self._async_clients[instance.key] = client
+        return client
+
+    def _coalesce_key(self, request_data: Dict) -> Optional[str]:
+        """Single-flight key for a request, or None if it must get its own upstream call.
+
+        Only deterministic requests are shared by default: two sampled requests
+        with the same payload are expected to produce different completions.
+        """
+        if not self.coalesce_requests:
+            return None
+        if not self.coalesce_nondeterministic and not is_deterministic(request_data):
+            return None
+        mode = "stream" if request_data.get("stream") else "full"
+        return f"{mode}:{canonical_request_key(request_data)}"
+
+    async def aexecute_request(self, request_data: Dict, read_cache: bool = True,
+                               write_cache: bool = True, priority: str = "normal",
+                               caller: Optional[str] = None) -> Dict:
+        """Execute a request on the best available instance without blocking the event loop.
+
+        Identical requests already in flight share that upstream call instead of
+        dispatching their own.
+        """
+        cache_key = self._cache_key(request_data)
+        cached = await self._read_cache(cache_key, read_cache)
+        if cached is not None:
+            return cached
+
+        flight_key = self._coalesce_key(request_data)
+        if flight_key:
+            if flight_key in self._flight:
+                self.metrics.coalesced_requests.labels("full").inc()
+            result = await self._flight.do(
+                flight_key, lambda: self._dispatch_request(request_data, priority, caller)
+            )
+        else:
+            result = await self._dispatch_request(request_data, priority, caller)
+
+        self._write_cache(cache_key, write_cache, result)
+        return result
+
+    async def abatch_execute(self, requests_data: List[Dict], priority: str = "batch",
+                             concurrency: Optional[int] = None,
+                             caller: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run many non-streaming requests across the cluster, yielding results as they finish.
+
+        At most `concurrency` items are in flight at once, by default the total
+        concurrency limit of the instances serving the batch's models, so a
+        large batch fills every node without spilling into the admission queue.
+        An item that times out in the queue or finds it full is queued again
+        after the suggested delay instead of failing, since batch work only
+        gets capacity no other class needs. Each item yields {"index",
+        "status", "latency"} plus "response" or "error". A final
+        {"summary": ...} reports counts and throughput. Closing the iterator
+        cancels the items still pending.
+        """
+        if concurrency is None:
+            models = {request_data.get("model") for request_data in requests_data}
             with self.lock:
-                instance.total_requests += 1
-                instance.avg_response_time = (
-                    (instance.avg_response_time * (instance.total_requests - 1) +
-                    (time.time() - start_time)) / instance.total_requests
+                serving = {i.key: i for model in models for i in self._available_instances(model)}
+                concurrency = sum(self._instance_capacity(i) for i in serving.values())
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(index: int, request_data: Dict) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.time()
+                while True:
+                    try:
+                        response = await self.aexecute_request(
+                            request_data, priority=priority, caller=caller
+                        )
+                        item = {"index": index, "status": "ok", "response": response}
+                    except ClusterSaturatedError as e:
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except Exception as e:
+                        item = {"index": index, "status": "error", "error": str(e)}
+                    break
+                item["latency"] = time.time() - started
+                return item
+
+        started = time.time()
+        succeeded = failed = completion_tokens = 0
+        tasks = [asyncio.ensure_future(run(index, r)) for index, r in enumerate(requests_data)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                if item["status"] == "ok":
+                    succeeded += 1
+                    usage = item["response"].get("usage") if isinstance(item["response"], dict) else None
+                    completion_tokens += (usage or {}).get("completion_tokens") or 0
+                else:
+                    failed += 1
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        elapsed = time.time() - started
+        yield {
+            "summary": {
+                "total": len(tasks),
+                "succeeded": succeeded,
+                "failed": failed,
+                "concurrency": concurrency,
+                "elapsed": elapsed,
+                "requests_per_second": len(tasks) / elapsed if elapsed > 0 else None,
+                "completion_tokens": completion_tokens,
+                "tokens_per_second": completion_tokens / elapsed if elapsed > 0 else None
+            }
+        }
+
+    def _mark_unreachable(self, instance: LMStudioInstance):
+        """Take a node out of rotation after a connection failure until its next probe"""
+        with self.lock:
+            if instance.is_healthy:
+                self.logger.warning(f"Instance {instance.key} is unreachable, removing from rotation")
+            instance.is_healthy = False
+            instance.health_check_interval = self.min_health_check_interval
+            instance.next_health_check = time.monotonic() + self.min_health_check_interval
+            self._rebuild_indexes()
+        self.metrics.instance_up.labels(instance.key).set(0)
+
+    def _allow_retry(self, request_data: Dict, tried: Set[str]) -> bool:
+        """Whether another attempt is possible and affordable"""
+        with self.lock:
+            others = [
+                i for i in self._available_instances(request_data.get("model"))
+                if i.key not in tried
+            ]
+        if not others:
+            return False
+        if not self.retry_budget.try_withdraw():
+            self.failover_stats["retries_denied"] += 1
+            self.metrics.retries.labels("denied").inc()
+            return False
+        self.failover_stats["retries"] += 1
+        self.metrics.retries.labels("allowed").inc()
+        return True
+
+    def _hedge_delay(self, histogram: RollingHistogram) -> Optional[float]:
+        """How long to wait on the first instance before hedging, or None to not hedge"""
+        if not self.hedge_requests:
+            return None
+        snapshot = histogram.snapshot()
+        if snapshot.count < 20:
+            return None
+        return max(self.hedge_min_delay, snapshot.quantile(self.hedge_quantile))
+
+    def _try_acquire_hedge(self, request_data: Dict, tried: Set[str]) -> Optional[Dispatch]:
+        """Claim a second instance for a hedge if one is free right now and the budget allows"""
+        with self.lock:
+            if self._waiters:
+                return None
+            affinity_key, continuation = self._affinity(request_data)
+            try:
+                dispatch = self._select_instance(
+                    request_data.get("model"), affinity_key, tried,
+                    self._request_size(request_data), continuation
                 )
-            
-            return response.json()
+            except Exception:
+                return None
+        if dispatch is None:
+            return None
+        if not self.retry_budget.try_withdraw():
+            self._release_instance(dispatch, None)
+            return None
+        self.failover_stats["hedges"] += 1
+        self.metrics.hedges.inc()
+        return dispatch
+
+    async def _race(self, primary: asyncio.Task, hedge: asyncio.Task, discard=None):
+        """Return the first successful result of two attempts and cancel the other.
+
+        If both succeed at once, `discard` is awaited with the losing result so
+        it can free what it holds.
+        """
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    winner = primary if primary in winners else winners[0]
+                    if winner is hedge:
+                        self.failover_stats["hedge_wins"] += 1
+                        self.metrics.hedge_wins.inc()
+                    for loser in winners:
+                        if loser is not winner and discard:
+                            await discard(loser.result())
+                    return winner.result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _dispatch_request(self, request_data: Dict, priority: str = "normal",
+                                caller: Optional[str] = None) -> Dict:
+        """Send one non-streaming request upstream, failing over to other instances.
+
+        Connection errors and 5xx responses are retried on an instance that
+        hasn't been tried yet, within the retry budget. With hedging enabled,
+        a duplicate goes to a second instance if the first hasn't answered
+        within the configured latency percentile, and the slower one is
+        cancelled.
+        """
+        self.retry_budget.deposit()
+        tried: Set[str] = set()
+        for attempt in range(self.max_attempts):
+            dispatch = await self._aacquire_instance(request_data, priority, tried, caller)
+            tried.add(dispatch.instance.key)
+            try:
+                return await self._hedged(
+                    self._send_request, request_data, dispatch, tried, self.cluster_latency
+                )
+            except InstanceError as e:
+                if attempt + 1 == self.max_attempts or not self._allow_retry(request_data, tried):
+                    raise e
+                self.logger.warning(f"Retrying request on another instance after: {str(e)}")
+
+    async def _hedged(self, attempt, request_data: Dict, dispatch: Dispatch,
+                      tried: Set[str], samples, discard=None):
+        """Run `attempt` on dispatch, hedging onto a second instance if it is slow"""
+        primary = asyncio.ensure_future(attempt(dispatch, request_data))
+        delay = self._hedge_delay(samples)
+        if delay is None:
+            return await primary
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        hedge_dispatch = self._try_acquire_hedge(request_data, tried)
+        if hedge_dispatch is None:
+            return await primary
+        tried.add(hedge_dispatch.instance.key)
+        hedge = asyncio.ensure_future(attempt(hedge_dispatch, request_data))
+        return await self._race(primary, hedge, discard)
+
+    async def _send_request(self, dispatch: Dispatch, request_data: Dict) -> Dict:
+        """POST a non-streaming request to the dispatched instance and release it"""
+        instance = dispatch.instance
+        client = self._get_async_client(instance)
+        try:
+            response = await client.post("/v1/chat/completions", json=request_data)
+            if response.status_code >= 400:
+                self._raise_for_status(instance, response.status_code, response.content)
+            result = response.json()
+        except asyncio.CancelledError:
+            self._release_instance(dispatch, None)
+            raise
+        except httpx.TransportError as e:
+            self._release_instance(dispatch, False)
+            if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                self._mark_unreachable(instance)
+            raise InstanceError(f"Instance {instance.key} failed: {e!r}") from e
         except Exception as e:
-            with self.lock:
-                instance.failed_requests += 1
+            self._release_instance(dispatch, False, rejected=isinstance(e, UpstreamRequestError))
+            raise e
+
+        latency = time.time() - dispatch.start_time
+        usage = result.get("usage") if isinstance(result, dict) else None
+        self._release_instance(dispatch, True, self._processed_tokens(
+            dispatch, (usage or {}).get("prompt_tokens"), (usage or {}).get("completion_tokens")
+        ))
+        self.cluster_latency.add(latency)
+        if usage:
+            self._count_tokens(dispatch, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        if usage and usage.get("completion_tokens") and latency > 0:
+            self._observe(dispatch, "completion_tokens_per_second", usage["completion_tokens"] / latency)
+        return result
+
+    @staticmethod
+    def _raise_for_status(instance: LMStudioInstance, status_code: int, body: bytes):
+        """Raise InstanceError for a 5xx, which another node may not repeat, else UpstreamRequestError"""
+        error = f"Instance {instance.key} returned {status_code}: {body[:200]!r}"
+        if status_code >= 500:
+            raise InstanceError(error)
+        try:
+            detail = json.loads(body)
+        except ValueError:
+            detail = body.decode(errors="replace")
+        raise UpstreamRequestError(error, status_code, detail)
+
+    def _count_tokens(self, dispatch: Dispatch, prompt_tokens: Optional[int],
+                      completion_tokens: Optional[int]):
+        """Count the tokens a backend reported and calibrate the size estimates with them"""
+        self.token_estimator.observe(
+            dispatch.model, dispatch.size.prompt_chars, dispatch.size.messages,
+            prompt_tokens, completion_tokens
+        )
+        model = dispatch.model or ""
+        if prompt_tokens:
+            self.metrics.tokens.labels(model, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            self.metrics.tokens.labels(model, "completion").inc(completion_tokens)
+
+    async def astream_request(self, request_data: Dict, priority: str = "normal",
+                              caller: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Open a streaming request on the best available instance.
+
+        The upstream status is checked before returning, so errors surface before
+        any bytes are sent to the client. The returned iterator relays the raw SSE
+        chunks as they arrive. Identical streams already in flight are fanned out
+        to the new caller, replaying what was sent so far.
+
+        The upstream is read by a task of its own, so the instance is released
+        even if the iterator is dropped without being started, e.g. because
+        the client disconnected before the first chunk. Only coalesced streams
+        keep their chunks for replay; others buffer a few chunks at most.
+        """
+        request_data = {**request_data, "stream": True}
+        flight_key = self._coalesce_key(request_data)
+        if not flight_key:
+            return StreamRelay(await self._open_stream(request_data, priority, caller)).iterate()
+
+        fanout = self._live_streams.get(flight_key)
+        if fanout is not None and not fanout.done:
+            self.live_stream_joins += 1
+            self.metrics.coalesced_requests.labels("stream").inc()
+        else:
+            if flight_key in self._flight:
+                self.metrics.coalesced_requests.labels("stream").inc()
+            fanout = await self._flight.do(
+                flight_key, lambda: self._start_fanout(flight_key, request_data, priority, caller)
+            )
+        return fanout.subscribe()
+
+    async def _start_fanout(self, flight_key: str, request_data: Dict,
+                            priority: str = "normal", caller: Optional[str] = None) -> StreamFanout:
+        stream = await self._open_stream(request_data, priority, caller)
+        fanout = StreamFanout(stream, on_done=lambda: self._live_streams.pop(flight_key, None))
+        self._live_streams[flight_key] = fanout
+        return fanout
+
+    async def _open_stream(self, request_data: Dict, priority: str = "normal",
+                           caller: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Open one streaming request upstream, failing over and hedging like _dispatch_request.
+
+        An attempt counts as started once the first chunk has arrived, so a
+        node that accepts the request but never produces output can still be
+        hedged. The returned relay must be handed to a StreamRelay or
+        StreamFanout straight away, which guarantee it is run or closed.
+        """
+        self.retry_budget.deposit()
+        tried: Set[str] = set()
+        for attempt in range(self.max_attempts):
+            dispatch = await self._aacquire_instance(request_data, priority, tried, caller)
+            tried.add(dispatch.instance.key)
+            try:
+                dispatch, response, chunks, first_chunk = await self._hedged(
+                    self._start_stream, request_data, dispatch, tried, self.cluster_ttft,
+                    discard=self._discard_stream
+                )
+                return self._relay_stream(dispatch, response, chunks, first_chunk)
+            except InstanceError as e:
+                if attempt + 1 == self.max_attempts or not self._allow_retry(request_data, tried):
+                    raise e
+                self.logger.warning(f"Retrying stream on another instance after: {str(e)}")
+
+    async def _start_stream(self, dispatch: Dispatch, request_data: Dict):
+        """Send a streaming request and wait for its first chunk.
+
+        Returns (dispatch, response, chunk iterator, first chunk). The instance is
+        released here on failure and by _relay_stream otherwise.
+        """
+        instance = dispatch.instance
+        client = self._get_async_client(instance)
+        response = None
+        try:
+            request = client.build_request("POST", "/v1/chat/completions", json=request_data)
+            response = await client.send(request, stream=True)
+            if response.status_code >= 400:
+                self._raise_for_status(instance, response.status_code, await response.aread())
+            chunks = response.aiter_raw()
+            first_chunk = await chunks.__anext__()
+        except BaseException as e:
+            if response is not None:
+                await response.aclose()
+            if isinstance(e, asyncio.CancelledError):
+                self._release_instance(dispatch, None)
+                raise
+            self._release_instance(dispatch, False, rejected=isinstance(e, UpstreamRequestError))
+            if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                self._mark_unreachable(instance)
+            if isinstance(e, (httpx.TransportError, StopAsyncIteration)):
+                raise InstanceError(f"Instance {instance.key} failed: {e!r}") from e
+            raise
+
+        dispatch.ttft = time.time() - dispatch.start_time
+        self.cluster_ttft.add(dispatch.ttft)
+        return dispatch, response, chunks, first_chunk
+
+    async def _discard_stream(self, started):
+        """Close a stream that lost a hedge race"""
+        dispatch, response, _, _ = started
+        await response.aclose()
+        self._release_instance(dispatch, None)
+
+    async def _relay_stream(self, dispatch: Dispatch, response: httpx.Response,
+                            chunks: AsyncIterator[bytes], first_chunk: bytes) -> AsyncIterator[bytes]:
+        """Relay upstream SSE chunks unbuffered while recording TTFT and tokens/sec"""
+        counter = SSETokenCounter()
+        first_token_time = time.time() if counter.feed(first_chunk) else None
+        success = None
+        try:
+            yield first_chunk
+            async for chunk in chunks:
+                if counter.feed(chunk) and first_token_time is None:
+                    first_token_time = time.time()
+                yield chunk
+            success = True
+        except Exception as e:
+            success = False
             raise e
+        finally:
+            await response.aclose()
+            self._release_instance(dispatch, success, self._processed_tokens(
+                dispatch, counter.prompt_tokens, counter.total_tokens
+            ))
+
+        if first_token_time is not None:
+            self._record_stream_metrics(dispatch, first_token_time, counter)
+
+    def _record_stream_metrics(self, dispatch: Dispatch, first_token_time: float,
+                               counter: SSETokenCounter):
+        """Record a completed stream's TTFT and prompt/generation rates"""
+        ttft = first_token_time - dispatch.start_time
+        generation_time = time.time() - first_token_time
+        if dispatch.affinity_outcome:
+            with self.lock:
+                self.affinity.observe_ttft(dispatch.affinity_outcome, ttft)
+        self._observe(dispatch, "ttft", ttft)
+        self.metrics.time_to_first_token.labels(dispatch.model or "").observe(ttft)
+        self._count_tokens(dispatch, counter.prompt_tokens, counter.total_tokens)
+        if counter.prompt_tokens and ttft > 0:
+            self._observe(dispatch, "prompt_tokens_per_second", counter.prompt_tokens / ttft)
+        if generation_time > 0:
+            self._observe(dispatch, "completion_tokens_per_second", counter.total_tokens / generation_time)
+
+    async def aclose(self):
+        """Stop the background threads and close all pooled async clients"""
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+        self._health_executor.shutdown(wait=False)
+        clients = list(self._async_clients.values())
+        self._async_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def list_models(self) -> List[str]:
+        """Models currently served by at least one healthy instance"""
+        with self.lock:
+            return sorted(
+                model for model, keys in self.model_index.items()
+                if any(self.instances[key].is_healthy for key in keys)
+            )
+
+    def _admission_status(self) -> Dict[str, Any]:
+        """Queue depth and wait statistics; call with the lock held"""
+        stats = self.admission_stats
+        now = time.time()
+        waiters = self._waiters.items()
+        classes = {}
+        for name, class_stats in stats["classes"].items():
+            admitted = class_stats["admitted_after_wait"]
+            classes[name] = {
+                "queue_depth": self._waiters.depth(name),
+                "queued_callers": self._waiters.callers(name),
+                "oldest_wait": max(
+                    (now - w.enqueued_at for w in waiters if w.priority_class == name), default=0.0
+                ),
+                "avg_wait": class_stats["total_wait"] / admitted if admitted else 0.0,
+                "max_wait": class_stats["max_wait"],
+                "admitted_after_wait": admitted
+            }
+        return {
+            "queue_depth": len(self._waiters),
+            "max_queue_size": self.max_queue_size,
+            "oldest_wait": max((now - w.enqueued_at for w in waiters), default=0.0),
+            "rejected_queue_full": stats["rejected_queue_full"],
+            "rejected_timeout": stats["rejected_timeout"],
+            "classes": classes
+        }
 
     def get_cluster_status(self) -> Dict:
-        """Get status of all instances in the cluster"""
+        """Get status of all instances in the cluster along with routing statistics"""
+        metrics = dict(self.instance_metrics)
         with self.lock:
-            return {
-                host: {
+            instances = {
+                key: {
+                    "host": instance.host,
+                    "port": instance.port,
                     "healthy": instance.is_healthy,
                     "load": instance.current_load,
                     "queue_length": instance.queue_length,
                     "total_requests": instance.total_requests,
                     "failed_requests": instance.failed_requests,
                     "avg_response_time": instance.avg_response_time,
-                    "last_check": instance.last_health_check.isoformat()
+                    "in_flight": instance.in_flight,
+                    "remote_in_flight": instance.remote_in_flight,
+                    "outstanding_tokens": instance.outstanding_tokens,
+                    "max_concurrency": self._instance_capacity(instance),
+                    "circuit": self._breaker(instance).status(),
+                    "ewma_latency": instance.ewma_latency,
+                    "weight": instance.weight,
+                    "models": list(instance.models),
+                    "metrics": metrics[key].summary() if key in metrics else None,
+                    "last_check": instance.last_health_check.isoformat(),
+                    "health_check_interval": instance.health_check_interval
+                }
+                for key, instance in self.instances.items()
+            }
+            return {
+                "instances": instances,
+                "models": {
+                    model: model_metrics.summary()
+                    for model, model_metrics in list(self.model_metrics.items())
+                },
+                "shared_state": {
+                    "gateway_id": self.shared_state.gateway_id,
+                    "leader": self.is_leader,
+                    "peers": self.shared_state.peers()
+                } if self.shared_state is not None else None,
+                "routing": {
+                    "strategy": self.router.name,
+                    "token_estimates": self.token_estimator.stats()
+                },
+                "admission": self._admission_status(),
+                "circuit_transitions": list(self.breaker_transitions),
+                "failover": {
+                    **self.failover_stats,
+                    "retry_budget_balance": self.retry_budget.balance,
+                    "hedge_delay": self._hedge_delay(self.cluster_latency),
+                    "stream_hedge_delay": self._hedge_delay(self.cluster_ttft)
+                },
+                "affinity": self.affinity.stats(),
+                "cache": self.response_cache.stats() if self.response_cache else None,
+                "coalescing": {
+                    "upstream_calls": self._flight.calls,
+                    "coalesced_requests": self._flight.coalesced,
+                    "live_stream_joins": self.live_stream_joins,
+                    "upstream_calls_saved": self._flight.coalesced + self.live_stream_joins
                 }
-                for host, instance in self.instances.items()
             }
@@ -1,113 +1,630 @@
 from redis import Redis
 from rq import Queue, Worker, Connection
-from typing import Any, Dict, Optional, List
+from rq.exceptions import DequeueTimeout, InvalidJobOperation
+from rq.job import Job, JobStatus
+from rq.timeouts import JobTimeoutException, TimerDeathPenalty
+from rq.utils import utcnow
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, List, Union
+import asyncio
 import json
 import logging
+import queue
+import signal
+import sys
+import threading
 import time
+import traceback
+import uuid
 from datetime import datetime
-import os
 from pathlib import Path
+from .health_view import shared_health_view
 
-class QueueManager:
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
-        self.redis = Redis.from_url(redis_url)
-        self.queue = Queue('lmstudio_tasks', connection=self.redis)
-        self.results_dir = Path("task_results")
+# Task state lives in one Redis hash per task, next to RQ's own job keys. Sorted
+# sets scored by creation time index the tasks overall, by status, by type, and
+# by status and type, so listing never has to scan or fetch every job.
+TASK_KEY_PREFIX = "lmstudio_tasks:task:"
+INDEX_KEY_PREFIX = "lmstudio_tasks:index"
+TASK_TYPES_KEY = "lmstudio_tasks:types"
+TASK_STATUSES = ("deferred", "queued", "started", "finished", "failed")
+TASK_TTL = 24 * 3600
+
+def _task_key(task_id: str) -> str:
+    return f"{TASK_KEY_PREFIX}{task_id}"
+
+def _index_key(status: Optional[str] = None, task_type: Optional[str] = None) -> str:
+    key = INDEX_KEY_PREFIX
+    if status:
+        key += f":status:{status}"
+    if task_type:
+        key += f":type:{task_type}"
+    return key
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+def _timestamp(value: Union[float, datetime, None]) -> Optional[float]:
+    return value.timestamp() if isinstance(value, datetime) else value
+
+def _record_state(pipe, task_id: str, task_type: str, created_ts: float, status: str,
+                  fields: Dict[str, Any]):
+    """Queue the commands that move a task to `status` on a pipeline"""
+    pipe.hset(_task_key(task_id), mapping={**fields, "status": status})
+    pipe.expire(_task_key(task_id), TASK_TTL)
+    for other in TASK_STATUSES:
+        if other != status:
+            pipe.zrem(_index_key(other), task_id)
+            pipe.zrem(_index_key(other, task_type), task_id)
+    pipe.zadd(_index_key(status), {task_id: created_ts})
+    pipe.zadd(_index_key(status, task_type), {task_id: created_ts})
+
+def _record_job_state(pipe, job, status: str, fields: Dict[str, Any]):
+    """Queue the commands that move a job's task to `status` on a pipeline"""
+    # Jobs queued before the indexes existed carry no meta
+    task_type = job.meta.get("task_type") or job.func_name.rsplit(".", 1)[-1]
+    created_ts = job.meta.get("created_ts") or job.created_at.timestamp()
+    _record_state(pipe, job.id, task_type, created_ts, status, fields)
+
+def _write_state(connection: Redis, job, status: str, fields: Dict[str, Any]):
+    """Move a job's task to `status` in one round trip"""
+    pipe = connection.pipeline(transaction=False)
+    _record_job_state(pipe, job, status, fields)
+    pipe.execute()
+
+def task_succeeded(job, connection, result, *args, **kwargs):
+    """RQ success callback: record the result in the task's state hash"""
+    _write_state(connection, job, "finished", {
+        "ended_at": datetime.now().isoformat(),
+        "result": json.dumps(result, default=str)
+    })
+
+def task_failed(job, connection, exc_type, exc_value, traceback):
+    """RQ failure callback: record the error in the task's state hash"""
+    _write_state(connection, job, "failed", {
+        "ended_at": datetime.now().isoformat(),
+        "error": f"{exc_type.__name__}: {exc_value}"
+    })
+
+class TaskFileSink:
+    """Write task records to JSON files from a background thread.
+
+    Redis holds the live state; the files are an archive that outlives the
+    Redis TTL. Writes are queued and never block the caller.
+    """
+
+    def __init__(self, results_dir: str = "task_results", max_pending: int = 10000):
+        self.results_dir = Path(results_dir)
         self.results_dir.mkdir(exist_ok=True)
+        self._pending: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="TaskFileSink", daemon=True)
+        self._thread.start()
+        self.logger = logging.getLogger("TaskFileSink")
+
+    def write(self, task_id: str, data: Dict[str, Any]):
+        try:
+            self._pending.put_nowait((task_id, data))
+        except queue.Full:
+            self.logger.warning(f"Dropping file record for task {task_id}: sink is backed up")
+
+    def load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.results_dir / f"{task_id}.json", 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            task_id, data = item
+            try:
+                with open(self.results_dir / f"{task_id}.json", 'w') as f:
+                    json.dump(data, f, default=str)
+            except OSError as e:
+                self.logger.error(f"Could not write record for task {task_id}: {str(e)}")
+
+    def close(self, timeout: float = 5.0):
+        """Flush pending writes and stop the writer thread"""
+        self._pending.put(None)
+        self._thread.join(timeout)
+
+class TaskQueue(Queue):
+    """RQ queue that marks deferred tasks queued when their dependencies finish"""
+
+    def _enqueue_job(self, job, pipeline=None, at_front: bool = False):
+        # RQ releases dependents through here, inside the parent's success transaction
+        if job.get_status(refresh=False) == JobStatus.DEFERRED:
+            if pipeline is not None:
+                _record_job_state(pipeline, job, "queued", {})
+            else:
+                _write_state(self.connection, job, "queued", {})
+        return super()._enqueue_job(job, pipeline=pipeline, at_front=at_front)
+
+class TaskWorker(Worker):
+    """RQ worker that marks tasks started in their state hash"""
+
+    queue_class = TaskQueue
+
+    def prepare_job_execution(self, job, *args, **kwargs):
+        super().prepare_job_execution(job, *args, **kwargs)
+        _write_state(self.connection, job, "started", {"started_at": datetime.now().isoformat()})
+
+class AsyncTaskWorker(TaskWorker):
+    """Worker that runs up to `concurrency` tasks at once in one process.
+
+    Agent tasks spend nearly all their time waiting on the cluster, so rather
+    than forking a process per job this one pulls jobs from an asyncio loop.
+    Coroutine tasks run on the loop and plain functions on a thread pool.
+    Registries, results, callbacks and dependents go through RQ's own Worker
+    methods, so jobs look the same as under `rq worker`.
+
+    On SIGINT or SIGTERM it stops taking jobs and gives running ones
+    `shutdown_timeout` seconds to finish. Whatever is still running then is
+    put back at the front of the queue for another worker. A task function
+    running in a thread can't be interrupted, so it may run twice, as with
+    any at-least-once queue. For the same reason a thread that overran its
+    timeout keeps its slot until it actually returns, and Redis bookkeeping
+    runs on its own threads so overrunning jobs can't starve it.
+    """
+
+    # Signal-based timeouts only work in the main thread
+    death_penalty_class = TimerDeathPenalty
+
+    def __init__(self, queues, concurrency: int = 8, shutdown_timeout: float = 30.0,
+                 poll_timeout: int = 5, **kwargs):
+        super().__init__(queues, **kwargs)
+        self.concurrency = concurrency
+        self.shutdown_timeout = shutdown_timeout
+        self.poll_timeout = poll_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._running: Dict[asyncio.Task, Job] = {}
+        self._job_executor: Optional[ThreadPoolExecutor] = None
+        self._job_threads: Dict[asyncio.Task, Future] = {}
+
+    def work_async(self):
+        """Process jobs until stopped by a signal or stop()"""
+        asyncio.run(self._run())
+
+    def stop(self):
+        """Stop taking jobs and shut down; safe to call from any thread"""
+        if self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _run(self):
+        loop = self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        # Redis bookkeeping for each running job, plus one each for dequeueing and heartbeats
+        executor = ThreadPoolExecutor(self.concurrency + 2, thread_name_prefix="AsyncTaskWorker")
+        loop.set_default_executor(executor)
+        self._job_executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="AsyncTaskWorker-job")
+        slots = asyncio.Semaphore(self.concurrency)
+
+        def finished(task: asyncio.Task):
+            self._running.pop(task, None)
+            thread = self._job_threads.pop(task, None)
+            if thread is None or thread.done():
+                slots.release()
+            else:
+                # Timed out or cancelled while its thread runs on; free the slot when it returns
+                thread.add_done_callback(release_from_thread)
+
+        def release_from_thread(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(slots.release)
+
+        await loop.run_in_executor(None, self.register_birth)
+        keep_alive = asyncio.create_task(self._keep_alive())
+        self.log.info(f"Async worker {self.name} started with {self.concurrency} slots")
+        try:
+            while await self._acquire_slot(slots):
+                dequeued = await loop.run_in_executor(None, self._dequeue)
+                if dequeued is None:
+                    slots.release()
+                    continue
+                job, job_queue = dequeued
+                if self._stopping.is_set():
+                    # Popped while shutting down; hand it straight back
+                    await loop.run_in_executor(None, self._hand_back, job, job_queue)
+                    slots.release()
+                    break
+                task = asyncio.create_task(self._perform(job, job_queue))
+                self._running[task] = job
+                task.add_done_callback(finished)
+        finally:
+            await self._drain()
+            keep_alive.cancel()
+            await loop.run_in_executor(None, self.register_death)
+            executor.shutdown(wait=False)
+            self._job_executor.shutdown(wait=False)
+            self.log.info(f"Async worker {self.name} stopped")
+
+    async def _acquire_slot(self, slots: asyncio.Semaphore) -> bool:
+        """Wait for a free slot; False if asked to stop first"""
+        acquire = asyncio.ensure_future(slots.acquire())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait((acquire, stopping), return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not acquire.done():
+            acquire.cancel()
+            return False
+        if self._stopping.is_set():
+            slots.release()
+            return False
+        return True
+
+    def _dequeue(self):
+        """Block for up to poll_timeout for the next job; call from a thread"""
+        try:
+            job, job_queue = self.queue_class.dequeue_any(
+                self.queues, self.poll_timeout, connection=self.connection,
+                job_class=self.job_class, serializer=self.serializer
+            ) or (None, None)
+        except DequeueTimeout:
+            return None
+        return (job, job_queue) if job is not None else None
+
+    def _hand_back(self, job: Job, job_queue: Queue):
+        """Return a dequeued but unstarted job to the front of its queue"""
+        with self.connection.pipeline() as pipeline:
+            pipeline.lrem(job_queue.intermediate_queue_key, 1, job.id)
+            job_queue.push_job_id(job.id, pipeline=pipeline, at_front=True)
+            pipeline.execute()
+
+    async def _drain(self):
+        """Let running jobs finish within shutdown_timeout, then requeue the rest"""
+        if not self._running:
+            return
+        self.log.info(f"Waiting up to {self.shutdown_timeout}s for {len(self._running)} running jobs")
+        _, pending = await asyncio.wait(list(self._running), timeout=self.shutdown_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _keep_alive(self):
+        """Refresh the worker's and running jobs' heartbeats so they aren't reaped"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.job_monitoring_interval)
+            jobs = list(self._running.values())
+            await loop.run_in_executor(None, self._heartbeat, jobs)
+
+    def _heartbeat(self, jobs: List[Job]):
+        with self.connection.pipeline() as pipeline:
+            self.heartbeat(self.job_monitoring_interval + 60, pipeline=pipeline)
+            for job in jobs:
+                job.heartbeat(utcnow(), self.job_monitoring_interval + 60, pipeline=pipeline, xx=True)
+            pipeline.execute()
+
+    async def _perform(self, job: Job, job_queue: Queue):
+        loop = asyncio.get_running_loop()
+        registry = job_queue.started_job_registry
+        await loop.run_in_executor(None, self.prepare_job_execution, job, len(self.queues) == 1)
+        job.started_at = utcnow()
+        timeout = job.timeout or self.queue_class.DEFAULT_TIMEOUT
+        try:
+            if asyncio.iscoroutinefunction(job.func):
+                call = job.func(*job.args, **job.kwargs)
+            else:
+                thread = self._job_executor.submit(job.perform)
+                self._job_threads[asyncio.current_task()] = thread
+                call = asyncio.wrap_future(thread)
+            try:
+                result = await asyncio.wait_for(call, timeout if timeout > 0 else None)
+            except asyncio.TimeoutError:
+                raise JobTimeoutException(f"Task exceeded maximum timeout value ({timeout} seconds)")
+        except asyncio.CancelledError:
+            await asyncio.shield(loop.run_in_executor(None, self._requeue, job, registry))
+            raise
+        except Exception:
+            job.ended_at = utcnow()
+            await loop.run_in_executor(None, self._handle_failure, job, job_queue, registry, sys.exc_info())
+        else:
+            job.ended_at = utcnow()
+            job._result = result
+            await loop.run_in_executor(None, self._handle_success, job, job_queue, registry, result)
+
+    def _handle_success(self, job: Job, job_queue: Queue, registry, result: Any):
+        try:
+            job.heartbeat(utcnow(), job.success_callback_timeout)
+            job.execute_success_callback(self.death_penalty_class, result)
+        except Exception:
+            self._handle_failure(job, job_queue, registry, sys.exc_info())
+            return
+        self.handle_job_success(job=job, queue=job_queue, started_job_registry=registry)
+
+    def _handle_failure(self, job: Job, job_queue: Queue, registry, exc_info):
+        exc_string = "".join(traceback.format_exception(*exc_info))
+        try:
+            job.heartbeat(utcnow(), job.failure_callback_timeout)
+            job.execute_failure_callback(self.death_penalty_class, *exc_info)
+        except Exception:
+            exc_info = sys.exc_info()
+            exc_string = "".join(traceback.format_exception(*exc_info))
+        self.handle_job_failure(job=job, exc_string=exc_string, queue=job_queue, started_job_registry=registry)
+        self.handle_exception(job, *exc_info)
+
+    def _requeue(self, job: Job, registry):
+        """Put an unfinished job back at the front of its queue"""
+        try:
+            registry.requeue(job, at_front=True)
+        except InvalidJobOperation:
+            return  # Already finished or reaped
+        _write_state(self.connection, job, "queued", {})
+        self.log.info(f"Requeued unfinished job {job.id}")
+
+class QueueManager:
+    def __init__(self, redis_url: str = "redis://localhost:6379",
+                 results_dir: Optional[str] = None, redis: Optional[Redis] = None):
+        self.redis = redis or Redis.from_url(redis_url)
+        self.queue = TaskQueue('lmstudio_tasks', connection=self.redis)
+        # Optional archive of task records on disk, off the enqueue path
+        self.sink = TaskFileSink(results_dir) if results_dir else None
 
     def enqueue_task(self, task_type: str, payload: Dict[str, Any]) -> str:
         """
         Enqueue a task and return its ID
         """
-        task_id = f"{task_type}_{int(time.time())}"
-        task_data = {
-            "id": task_id,
+        task_data = self._new_task(task_type, payload)
+        task_id = task_data["id"]
+
+        # Job and state hash go to Redis in one transaction and one round trip.
+        # RQ puts the pipeline in MULTI mode, so the job has to be queued first.
+        pipe = self.redis.pipeline()
+        self.queue.enqueue_call(
+            f"tasks.{task_type}", args=(task_data,), job_id=task_id,
+            pipeline=pipe, **self._job_options(task_data)
+        )
+        self._record_new_task(pipe, task_data)
+        pipe.execute()
+
+        if self.sink:
+            self.sink.write(task_id, task_data)
+        return task_id
+
+    def enqueue_many(self, tasks: List[Dict[str, Any]]) -> List[str]:
+        """
+        Enqueue a batch of tasks and return their IDs in the same order.
+
+        Each task is a dict with "type", "payload" and optionally "depends_on":
+        a list of indexes of earlier tasks in the batch and/or IDs of tasks
+        already queued. A task with dependencies is deferred until they all
+        finish, e.g. the Architecture -> Code -> Testing -> Deployment chain:
+
+            manager.enqueue_many([
+                {"type": "agent_task", "payload": {"role": "architect", ...}},
+                {"type": "agent_task", "payload": {"role": "developer", ...}, "depends_on": [0]},
+                {"type": "agent_task", "payload": {"role": "tester", ...}, "depends_on": [1]},
+                {"type": "agent_task", "payload": {"role": "deployer", ...}, "depends_on": [2]},
+            ])
+
+        Every job and its state go to Redis in one transaction. Dependents of
+        tasks in the same batch are registered as deferred inside it, before
+        any worker can see their parents. Only tasks that depend on tasks
+        queued earlier take RQ's own dependency path, one round trip each.
+        """
+        batch = [self._new_task(task["type"], task.get("payload", {})) for task in tasks]
+        dependencies = []
+        for index, task in enumerate(tasks):
+            depends_on = []
+            for dependency in task.get("depends_on") or []:
+                if isinstance(dependency, int):
+                    if not 0 <= dependency < index:
+                        raise ValueError(f"Task {index} can only depend on earlier tasks in the batch")
+                    depends_on.append(batch[dependency]["id"])
+                else:
+                    depends_on.append(dependency)
+            dependencies.append(depends_on)
+        batch_ids = {task_data["id"] for task_data in batch}
+
+        independent, external = [], []
+        pipe = self.redis.pipeline()
+        for task_data, depends_on in zip(batch, dependencies):
+            job_args = dict(
+                func=f"tasks.{task_data['type']}", args=(task_data,), job_id=task_data["id"],
+                **self._job_options(task_data)
+            )
+            if not depends_on:
+                independent.append(Queue.prepare_data(**job_args))
+            elif all(dependency in batch_ids for dependency in depends_on):
+                task_data["status"] = "deferred"
+                job = self.queue.create_job(
+                    depends_on=depends_on, status=JobStatus.DEFERRED, **job_args
+                )
+                # Reuse the queue's cached server version; save() would ask Redis per job
+                job.redis_server_version = self.queue.get_redis_server_version()
+                job.register_dependency(pipeline=pipe)
+                job.save(pipeline=pipe)
+            else:
+                task_data["status"] = "deferred"
+                external.append(Queue.prepare_data(depends_on=depends_on, **job_args))
+        if independent:
+            self.queue.enqueue_many(independent, pipeline=pipe)
+        for task_data in batch:
+            self._record_new_task(pipe, task_data)
+        pipe.execute()
+
+        if external:
+            # RQ WATCHes each dependency so one finishing meanwhile isn't missed
+            pipe = self.redis.pipeline(transaction=False)
+            for job in self.queue.enqueue_many(external):
+                if job.get_status(refresh=False) == JobStatus.QUEUED:
+                    _record_state(pipe, job.id, job.meta["task_type"], job.meta["created_ts"], "queued", {})
+            pipe.execute()
+
+        if self.sink:
+            for task_data in batch:
+                self.sink.write(task_data["id"], task_data)
+        return [task_data["id"] for task_data in batch]
+
+    @staticmethod
+    def _new_task(task_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": f"{task_type}_{uuid.uuid4().hex}",
             "type": task_type,
             "payload": payload,
             "status": "queued",
             "created_at": datetime.now().isoformat()
         }
-        
-        # Save task data
-        self._save_task_data(task_id, task_data)
-        
-        # Enqueue the task
-        job = self.queue.enqueue(
-            f"tasks.{task_type}",
-            task_data,
-            job_id=task_id,
-            result_ttl=3600  # Keep result for 1 hour
-        )
-        
-        return task_id
+
+    @staticmethod
+    def _job_options(task_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "result_ttl": 3600,  # Keep result for 1 hour
+            "on_success": task_succeeded,
+            "on_failure": task_failed,
+            "meta": {
+                "task_type": task_data["type"],
+                "created_ts": datetime.fromisoformat(task_data["created_at"]).timestamp()
+            }
+        }
+
+    @staticmethod
+    def _record_new_task(pipe, task_data: Dict[str, Any]):
+        """Queue the state hash and index entries for a new task on a pipeline"""
+        task_id, task_type = task_data["id"], task_data["type"]
+        created_ts = datetime.fromisoformat(task_data["created_at"]).timestamp()
+        pipe.zadd(_index_key(), {task_id: created_ts})
+        pipe.zadd(_index_key(task_type=task_type), {task_id: created_ts})
+        pipe.sadd(TASK_TYPES_KEY, task_type)
+        _record_state(pipe, task_id, task_type, created_ts, task_data["status"], {
+            "id": task_id,
+            "type": task_type,
+            "created_at": task_data["created_at"]
+        })
 
     def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """
         Get the current status of a task
         """
-        job = self.queue.fetch_job(task_id)
-        if not job:
-            # Check if we have saved results
-            saved_data = self._load_task_data(task_id)
+        state = self.redis.hgetall(_task_key(task_id))
+        if not state:
+            # Expired from Redis; the file archive may still have it
+            saved_data = self.sink.load(task_id) if self.sink else None
             if saved_data:
                 return saved_data
             return {"status": "not_found"}
 
-        status = {
-            "id": task_id,
-            "status": job.get_status(),
-            "created_at": job.created_at.isoformat() if job.created_at else None,
-            "ended_at": job.ended_at.isoformat() if job.ended_at else None,
-            "result": job.result,
-            "error": str(job.exc_info) if job.exc_info else None
-        }
-
-        # Save updated status
-        self._save_task_data(task_id, status)
-        
+        status = self._task_status(state)
+        if self.sink and status["status"] in ("finished", "failed") and not status["archived"]:
+            # Archive the final state once, however often it's polled
+            self.redis.hset(_task_key(task_id), "archived", 1)
+            self.sink.write(task_id, status)
         return status
 
-    def list_tasks(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _task_status(state: Dict[Any, Any]) -> Dict[str, Any]:
+        """Shape a raw state hash into the status returned to callers"""
+        state = {_decode(k): _decode(v) for k, v in state.items()}
+        result = state.get("result")
+        return {
+            "id": state.get("id"),
+            "type": state.get("type"),
+            "status": state.get("status"),
+            "created_at": state.get("created_at"),
+            "started_at": state.get("started_at"),
+            "ended_at": state.get("ended_at"),
+            "result": json.loads(result) if result else None,
+            "error": state.get("error"),
+            "archived": bool(state.get("archived"))
+        }
+
+    def get_task_statuses(self, task_ids: Iterable[str]) -> List[Dict[str, Any]]:
         """
-        List all tasks, optionally filtered by status
+        Get the status of many tasks in one round trip; unknown IDs come back as not_found
         """
-        tasks = []
-        for job_id in self.queue.job_ids:
-            job_status = self.get_task_status(job_id)
-            if not status or job_status.get("status") == status:
-                tasks.append(job_status)
-        return tasks
+        task_ids = list(task_ids)
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.hgetall(_task_key(task_id))
+        return [
+            self._task_status(state) if state else {"id": task_id, "status": "not_found"}
+            for task_id, state in zip(task_ids, pipe.execute())
+        ]
 
-    def _save_task_data(self, task_id: str, data: Dict[str, Any]):
-        """Save task data to file"""
-        task_file = self.results_dir / f"{task_id}.json"
-        with open(task_file, 'w') as f:
-            json.dump(data, f, indent=2)
+    def list_tasks(self, status: Optional[str] = None, task_type: Optional[str] = None,
+                   since: Union[float, datetime, None] = None,
+                   until: Union[float, datetime, None] = None,
+                   offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        List tasks newest first, optionally filtered by status, type and creation
+        time (datetime or epoch seconds), one page of `limit` at a time
+        """
+        task_ids = self.redis.zrevrangebyscore(
+            _index_key(status, task_type),
+            _timestamp(until) if until is not None else "+inf",
+            _timestamp(since) if since is not None else "-inf",
+            start=offset, num=limit
+        )
+        tasks = self.get_task_statuses(_decode(task_id) for task_id in task_ids)
+        # Index entries can outlive an expired state hash until the next cleanup
+        return [task for task in tasks if task["status"] != "not_found"]
 
-    def _load_task_data(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Load task data from file"""
-        task_file = self.results_dir / f"{task_id}.json"
-        try:
-            with open(task_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return None
+    def count_tasks(self, status: Optional[str] = None, task_type: Optional[str] = None,
+                    since: Union[float, datetime, None] = None,
+                    until: Union[float, datetime, None] = None) -> int:
+        """
+        Count tasks matching the same filters as list_tasks
+        """
+        return self.redis.zcount(
+            _index_key(status, task_type),
+            _timestamp(since) if since is not None else "-inf",
+            _timestamp(until) if until is not None else "+inf"
+        )
 
     def cleanup_old_tasks(self, max_age_hours: int = 24):
         """
-        Clean up old task results
+        Clean up tasks created more than `max_age_hours` ago: their state, index
+        entries and archived files
         """
         current_time = time.time()
-        for task_file in self.results_dir.glob("*.json"):
+        cutoff = current_time - max_age_hours * 3600
+        task_types = [_decode(t) for t in self.redis.smembers(TASK_TYPES_KEY)]
+        old_ids = self.redis.zrangebyscore(_index_key(), "-inf", cutoff)
+        pipe = self.redis.pipeline(transaction=False)
+        for task_id in old_ids:
+            pipe.delete(_task_key(_decode(task_id)))
+        for status in (None,) + TASK_STATUSES:
+            pipe.zremrangebyscore(_index_key(status), "-inf", cutoff)
+            for task_type in task_types:
+                pipe.zremrangebyscore(_index_key(status, task_type), "-inf", cutoff)
+        pipe.execute()
+
+        if not self.sink:
+            return
+        for task_file in self.sink.results_dir.glob("*.json"):
             if (current_time - task_file.stat().st_mtime) > (max_age_hours * 3600):
                 task_file.unlink()
 
+    def close(self):
+        if self.sink:
+            self.sink.close()
+
     @staticmethod
     def start_worker(redis_url: str = "redis://localhost:6379"):
         """
         Start a worker process
         """
         redis_conn = Redis.from_url(redis_url)
+        # Work horses forked from here inherit a fresh health snapshot instead of probing
+        shared_health_view()
         with Connection(redis_conn):
-            worker = Worker(['lmstudio_tasks'])
+            worker = TaskWorker(['lmstudio_tasks'])
             worker.work()
+
+    @staticmethod
+    def start_async_worker(redis_url: str = "redis://localhost:6379", concurrency: int = 8,
+                           shutdown_timeout: float = 30.0):
+        """
+        Start a worker process that runs up to `concurrency` tasks at once
+        """
+        shared_health_view()
+        worker = AsyncTaskWorker(
+            ['lmstudio_tasks'], connection=Redis.from_url(redis_url),
+            concurrency=concurrency, shutdown_timeout=shutdown_timeout
+        )
+        worker.work_async()
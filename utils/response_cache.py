@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+# Request fields that don't change what the model generates
+NON_SEMANTIC_FIELDS = {"stream", "user"}
+
+def canonical_request_key(request_data: Dict[str, Any]) -> str:
+    """Hash the model, messages and sampling parameters of a chat request"""
+    canonical = {
+        key: value for key, value in request_data.items()
+        if value is not None and key not in NON_SEMANTIC_FIELDS
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def is_deterministic(request_data: Dict[str, Any]) -> bool:
+    """Whether repeating the request should reproduce the same completion"""
+    return request_data.get("temperature") == 0 or request_data.get("seed") is not None
+
+class ResponseCache:
+    """Bounded LRU cache of completions with TTL expiry and an optional on-disk tier.
+
+    The memory tier holds at most `max_entries` responses. With `disk_dir` set,
+    every stored response is also written there in the background and survives
+    memory eviction and restarts. A disk hit is promoted back into memory.
+    On an event loop use `aget`, which reads the disk tier in a worker thread.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600,
+                 disk_dir: Optional[Union[str, Path]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self._disk_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-disk") if self.disk_dir else None
+        self.logger = logging.getLogger("ResponseCache")
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached response for key, or None"""
+        now = time.time()
+        response = self._get_memory(key, now)
+        if response is not None:
+            return response
+        return self._finish_lookup(key, self._read_disk(key, now))
+
+    async def aget(self, key: str) -> Optional[Dict]:
+        """Like get, without blocking the event loop on the disk tier"""
+        now = time.time()
+        response = self._get_memory(key, now)
+        if response is not None:
+            return response
+        entry = await asyncio.to_thread(self._read_disk, key, now) if self.disk_dir else None
+        return self._finish_lookup(key, entry)
+
+    def _get_memory(self, key: str, now: float) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        return None
+
+    def _finish_lookup(self, key: str, entry: Optional[Tuple[float, Dict]]) -> Optional[Dict]:
+        """Count a memory miss and promote what the disk tier found"""
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, entry)
+        return entry[1]
+
+    def put(self, key: str, response: Dict):
+        """Store a response under key"""
+        entry = (time.time() + self.ttl, response)
+        with self._lock:
+            self._insert(key, entry)
+            self.stores += 1
+        if self._disk_writer:
+            self._disk_writer.submit(self._write_disk, key, entry)
+
+    def record_bypass(self):
+        """Count a request that skipped the cache because of its headers"""
+        with self._lock:
+            self.bypasses += 1
+
+    def _insert(self, key: str, entry: Tuple[float, Dict]):
+        """Insert into the memory tier; call with the lock held"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, Dict]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data["expires_at"] <= now:
+            path.unlink(missing_ok=True)
+            return None
+        return data["expires_at"], data["response"]
+
+    def _write_disk(self, key: str, entry: Tuple[float, Dict]):
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"expires_at": entry[0], "response": entry[1]}, f)
+            tmp_path.replace(path)
+        except OSError as e:
+            self.logger.error(f"Failed to write cache entry {key}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,162 @@
+import asyncio
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Share one in-flight coroutine among concurrent callers with the same key.
+
+    The first caller starts the work as a task; callers arriving before it
+    finishes await the same task. A caller being cancelled doesn't cancel the
+    work unless it was the last one waiting for it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0  # Times the work actually ran
+        self.coalesced = 0  # Callers served by somebody else's call
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self.calls += 1
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def __contains__(self, key: str) -> bool:
+        """Whether a call for `key` is in flight, i.e. a `do` now would be coalesced"""
+        return key in self._calls
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+class StreamFanout:
+    """Relay one upstream byte stream to any number of subscribers.
+
+    Chunks are buffered for the lifetime of the stream so late subscribers
+    replay from the start and then follow live. The upstream is cancelled if
+    every subscriber leaves before it finishes.
+    """
+
+    def __init__(self, source: AsyncIterator[bytes], on_done: Optional[Callable[[], None]] = None):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self._pump_task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[bytes]):
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self.done = True
+            if self._on_done:
+                self._on_done()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def subscribe(self) -> AsyncIterator[bytes]:
+        """Register a subscriber now and return its chunk iterator"""
+        self.subscribers += 1
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        position = 0
+        try:
+            while True:
+                if position < len(self.chunks):
+                    position += 1
+                    yield self.chunks[position - 1]
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.done or position < len(self.chunks))
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self._pump_task.cancel()
+
+class StreamRelay:
+    """Relay one upstream byte stream to a single reader through a bounded buffer.
+
+    A task pulls the source from the start, so the source's own cleanup runs
+    even if the reader never starts. At most `max_buffered` chunks wait for
+    the reader, so a slow reader slows the source down instead of growing
+    memory. The source is closed if the reader closes the iterator early or
+    drops it, started or not.
+    """
+
+    _END = object()
+
+    def __init__(self, source: AsyncIterator[bytes], max_buffered: int = 64):
+        self._buffer: asyncio.Queue = asyncio.Queue(max_buffered)
+        self._started = False
+        self._stopped = False
+        self._pump_task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[bytes]):
+        self._started = True
+        try:
+            # Always take the first chunk: closing a generator that never started skips its finally
+            async for chunk in source:
+                if self._stopped:
+                    return
+                await self._buffer.put(chunk)
+        except Exception as e:
+            await self._buffer.put(e)
+        else:
+            await self._buffer.put(self._END)
+        finally:
+            await source.aclose()
+
+    def _stop(self):
+        self._stopped = True
+        if self._started:
+            self._pump_task.cancel()
+
+    def iterate(self) -> AsyncIterator[bytes]:
+        """The reader's chunk iterator; call once"""
+        iterator = self._iterate()
+        # An iterator dropped before it starts never runs its finally block
+        weakref.finalize(iterator, self._stop)
+        return iterator
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                item = await self._buffer.get()
+                if item is self._END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self._stop()
@@ -0,0 +1,87 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tokens a chat template adds around each message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Plausible chars-per-token range across tokenizers, from CJK text to long English words
+MIN_CHARS_PER_TOKEN = 1.0
+MAX_CHARS_PER_TOKEN = 8.0
+
+def prompt_chars(messages: List[Dict[str, Any]]) -> int:
+    """Characters of message content in a chat request"""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += len(content)
+        elif isinstance(content, list):  # Multi-part content
+            total += sum(len(part.get("text") or "") for part in content if isinstance(part, dict))
+    return total
+
+class TokenEstimator:
+    """Predict a chat request's prompt and completion tokens without a tokenizer.
+
+    Prompt tokens come from the character count divided by a chars-per-token
+    ratio learnt per model from the prompt_tokens that backends report,
+    starting at 4 (typical for BPE vocabularies on English and code).
+    Completion tokens are the running mean the model has produced, capped by
+    the request's max_tokens.
+    """
+
+    def __init__(self, default_chars_per_token: float = 4.0,
+                 default_completion_tokens: int = 256, smoothing: float = 0.1):
+        self.default_chars_per_token = default_chars_per_token
+        self.default_completion_tokens = default_completion_tokens
+        self.smoothing = smoothing
+        self._chars_per_token: Dict[str, float] = {}
+        self._completion_tokens: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, request_data: Dict[str, Any],
+                 model: Optional[str] = None) -> Tuple[int, int, int]:
+        """(prompt characters, predicted prompt tokens, predicted completion tokens).
+
+        `model` overrides the request's model as the key for learnt ratios.
+        """
+        model = (model if model is not None else request_data.get("model")) or ""
+        messages = request_data.get("messages") or []
+        chars = prompt_chars(messages)
+        ratio = self._chars_per_token.get(model, self.default_chars_per_token)
+        prompt_tokens = int(chars / ratio) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+        completion_tokens = int(self._completion_tokens.get(model, self.default_completion_tokens))
+        max_tokens = request_data.get("max_tokens")
+        if max_tokens and max_tokens > 0:
+            completion_tokens = min(completion_tokens, max_tokens)
+        return chars, prompt_tokens, max(1, completion_tokens)
+
+    def observe(self, model: Optional[str], chars: int, messages: int,
+                prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        """Calibrate from the token counts a backend reported for a request"""
+        model = model or ""
+        with self._lock:
+            if prompt_tokens and chars:
+                content_tokens = prompt_tokens - MESSAGE_OVERHEAD_TOKENS * messages
+                if content_tokens > 0:
+                    # Clamp so one odd usage report can't skew every estimate for the model
+                    ratio = min(max(chars / content_tokens, MIN_CHARS_PER_TOKEN), MAX_CHARS_PER_TOKEN)
+                    self._chars_per_token[model] = self._blend(self._chars_per_token.get(model), ratio)
+            if completion_tokens:
+                self._completion_tokens[model] = self._blend(
+                    self._completion_tokens.get(model), completion_tokens
+                )
+
+    def _blend(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                model: {
+                    "chars_per_token": self._chars_per_token.get(model),
+                    "avg_completion_tokens": self._completion_tokens.get(model)
+                }
+                for model in set(self._chars_per_token) | set(self._completion_tokens)
+            }